@@ -0,0 +1,513 @@
+import argparse
+import bisect
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import forge_scraper as forge
+
+# Benchmarks for the fetch, result and export paths, run against a local stand-in for
+# the subgraph so the numbers do not depend on the network or the real endpoint.
+#
+#   python benchmark.py                       run everything and compare with the baseline
+#   python benchmark.py --save-baseline       run everything and store the results as the baseline
+#   python benchmark.py --rows 1000 10000 --latency 0.05 --error-rate 0.02 --page-size 500 --rate 20
+
+BASELINE_PATH = 'benchmark_baseline.json'
+
+# A case regresses when it is this much slower (or bigger) than its baseline
+REGRESSION_TOLERANCE = 0.2
+
+DEFAULT_ROWS = [1000, 10000]
+DEFAULT_REPEAT = 3
+
+# Synthetic rows, in id order. Timestamps repeat so keyset pagination has ties to skip.
+START_TIME = 1600000000
+POOLS = [f'0x{n:040x}' for n in range(1, 9)]
+TOKENS = [f'0x{n:040x}' for n in range(1000, 1010)]
+
+def swap_row(i):
+    return {
+        'id': f'0x{i:064x}',
+        'timestamp': str(START_TIME + i // 3),
+        'pool': POOLS[i % len(POOLS)],
+        'token0': TOKENS[i % len(TOKENS)],
+        'token1': TOKENS[(i + 1) % len(TOKENS)],
+        'origin': f'0x{i % 97:040x}',
+        'amount0': str(-(i % 13 + 1) * 1.25),
+        'amount1': str((i % 7 + 1) * 2.5),
+        'amountUSD': str((i % 101) * 3.75)
+    }
+
+def pool_row(i):
+    return {
+        'id': f'0x{i:040x}',
+        'token0': TOKENS[i % len(TOKENS)],
+        'token1': TOKENS[(i + 1) % len(TOKENS)],
+        'feeTier': str([500, 3000, 10000][i % 3]),
+        'liquidity': str(10 ** 30 + i),
+        'sqrtPrice': str(2 ** 96 + i),
+        'token0Price': str(1.5 + i % 10),
+        'token1Price': str(1 / (1.5 + i % 10)),
+        'volumeUSD': str(i * 10.5),
+        'txCount': str(i * 3),
+        'totalValueLockedUSD': str(i * 100.25)
+    }
+
+def pool_day_row(i):
+    return {
+        'id': f'{POOLS[i % len(POOLS)]}-{i // len(POOLS)}',
+        'date': START_TIME + (i // len(POOLS)) * 86400,
+        'pool': POOLS[i % len(POOLS)],
+        'volumeUSD': str(i * 7.5),
+        'tvlUSD': str(i * 50.25),
+        'feesUSD': str(i * 0.02),
+        'txCount': str(i % 500),
+        'open': str(1.5), 'high': str(1.75), 'low': str(1.25), 'close': str(1.6)
+    }
+
+def token_row(i):
+    return {
+        'id': f'0x{1000 + i:040x}',
+        'symbol': f'TK{i}',
+        'name': f'Token {i}',
+        'decimals': str([18, 6, 8][i % 3]),
+        'volumeUSD': str(i * 12.5)
+    }
+
+DATASETS = {
+    'swaps': (swap_row, 'timestamp'),
+    'pools': (pool_row, 'id'),
+    'poolDayDatas': (pool_day_row, 'date'),
+    'tokens': (token_row, 'id')
+}
+
+COLLECTION_PATTERN = re.compile(r'(?:(\w+):\s*)?(\w+)\(([^)]*)\)\s*\{((?:[^{}]|\{[^{}]*\})*)\}')
+# Selected fields; entity references come as "pool { id }"
+SELECTION_PATTERN = re.compile(r'(\w+)(\s*\{\s*id\s*\})?')
+ARGUMENT_PATTERN = re.compile(r'(\w+): ("(?:[^"\\]|\\.)*"|\[[^\]]*\]|[^,\s}]+)')
+FILTER_SUFFIXES = ('_not_in', '_in', '_gte', '_gt', '_lte', '_lt')
+
+def sort_value(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+def parse_filters(text):
+    filters = []
+    for key, raw in ARGUMENT_PATTERN.findall(text):
+        value = json.loads(raw) if raw[0] in '"[' else sort_value(raw)
+        field, op = key, 'eq'
+        for suffix in FILTER_SUFFIXES:
+            if key.endswith(suffix):
+                field, op = key[:-len(suffix)], suffix[1:]
+                break
+        filters.append((field, op, value))
+    return filters
+
+def row_matches(row, filters):
+    for field, op, value in filters:
+        current = row.get(field)
+        if op == 'in':
+            if current not in value:
+                return False
+        elif op == 'not_in':
+            if current in value:
+                return False
+        elif op == 'eq':
+            if sort_value(current) != sort_value(value):
+                return False
+        else:
+            current, value = sort_value(current), sort_value(value)
+            if ((op == 'gt' and not current > value) or (op == 'gte' and not current >= value)
+                    or (op == 'lt' and not current < value) or (op == 'lte' and not current <= value)):
+                return False
+    return True
+
+# A local HTTP stand-in for the subgraph endpoint. It answers the keyset queries that
+# build_query/paginate/backfill send (including aliased batches), adds a
+# fixed latency to every request and fails a share of them with HTTP 503.
+class MockSubgraph:
+    def __init__(self, rows, latency=0.0, error_rate=0.0, seed=1):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+        self.data = {}
+        for collection, (make_row, order_field) in DATASETS.items():
+            data = [make_row(i) for i in range(rows)]
+            self.data[collection] = (data, order_field, [sort_value(row[order_field]) for row in data])
+
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                status, payload = mock.answer(json.loads(body)['query'])
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                if status != 200:
+                    self.send_header('Retry-After', '0')
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def select(self, collection, arguments, fields):
+        data, order_field, keys = self.data[collection]
+        first = int(re.search(r'first:\s*(\d+)', arguments).group(1))
+        where = re.search(r'where:\s*\{(.*)\}', arguments)
+        filters = parse_filters(where.group(1)) if where else []
+
+        # Rows are stored in order_field order, so a lower bound on it is a bisect
+        start = 0
+        for field, op, value in filters:
+            if field == order_field and op in ('gt', 'gte'):
+                bisector = bisect.bisect_right if op == 'gt' else bisect.bisect_left
+                start = max(start, bisector(keys, sort_value(value)))
+
+        candidates = data[start:] if start else data
+        if re.search(r'orderDirection:\s*desc', arguments):
+            candidates = reversed(candidates)
+        selected = []
+        for row in candidates:
+            if len(selected) >= first:
+                break
+            if row_matches(row, filters):
+                selected.append({field: {'id': row.get(field)} if reference else row.get(field)
+                                 for field, reference in fields})
+        return selected
+
+    def answer(self, query):
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.requests += 1
+            failed = self.random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        if failed:
+            return 503, b'{"error": "unavailable"}'
+
+        data = {}
+        for alias, collection, arguments, selection in COLLECTION_PATTERN.findall(query):
+            if collection not in self.data:
+                payload = json.dumps({'errors': [{'message': f'Unknown collection {collection}'}]}).encode()
+                return 200, payload
+            data[alias or collection] = self.select(collection, arguments, SELECTION_PATTERN.findall(selection))
+        payload = json.dumps({'data': data}).encode()
+        with self.lock:
+            self.bytes_sent += len(payload)
+        return 200, payload
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+# Stand-in for the Sheets API client: answers the calls SheetsSink makes and counts the cells
+class FakeRequest:
+    def __init__(self, reply, latency=0.0, on_execute=None):
+        self.reply = reply
+        self.latency = latency
+        self.on_execute = on_execute
+
+    def execute(self, http=None, num_retries=0):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.on_execute is not None:
+            self.on_execute()
+        return self.reply
+
+class FakeSheetsService:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.cells = 0
+        self.lock = threading.Lock()
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    def get(self, spreadsheetId=None, fields=None, range=None):
+        if range is not None:
+            return FakeRequest({'values': []}, self.latency)
+        properties = {'title': 'Benchmark', 'sheetId': 0, 'gridProperties': {'rowCount': 1000, 'columnCount': 26}}
+        return FakeRequest({'sheets': [{'properties': properties}]}, self.latency)
+
+    def clear(self, spreadsheetId=None, range=None, body=None):
+        return FakeRequest({}, self.latency)
+
+    def batchUpdate(self, spreadsheetId=None, body=None):
+        def count():
+            with self.lock:
+                self.cells += sum(len(row) for entry in body.get('data', []) for row in entry['values'])
+        return FakeRequest({}, self.latency, count)
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+SWAP_FIELDS = ['id', 'timestamp', 'pool', 'token0', 'token1', 'origin', 'amount0', 'amount1', 'amountUSD']
+
+def swap_result(rows):
+    result = forge.QueryResult("Swap")
+    for start in range(0, rows, forge.PAGE_SIZE):
+        result.add('swaps', [swap_row(i) for i in range(start, min(rows, start + forge.PAGE_SIZE))])
+    return result
+
+# Each case returns (rows processed, per-operation latencies in seconds)
+def uncached(transport):
+    return partial(forge.query_subgraph, transport=transport, cache=False)
+
+def bench_query_subgraph(args, transport):
+    fetch = uncached(transport)
+    query = "query {" + forge.build_query("Swap", SWAP_FIELDS, min(args.page_size, args.rows), order_by='timestamp', order_direction='asc') + "}"
+    latencies, rows = [], 0
+    for _ in range(max(1, args.rows // args.page_size)):
+        started = time.perf_counter()
+        rows += len(fetch(query)['swaps'])
+        latencies.append(time.perf_counter() - started)
+    return rows, latencies
+
+def bench_paginate(args, transport):
+    latencies, rows = [], 0
+    started = time.perf_counter()
+    for page in forge.paginate("Swap", SWAP_FIELDS, args.rows, page_size=args.page_size, fetch=uncached(transport)):
+        now = time.perf_counter()
+        latencies.append(now - started)
+        started = now
+        rows += len(page)
+    return rows, latencies
+
+def bench_paginate_stream(args, transport):
+    latencies, rows = [], 0
+    started = time.perf_counter()
+    for batch in forge.paginate("Swap", SWAP_FIELDS, args.rows, page_size=args.page_size,
+                                fetch_rows=partial(forge.stream_subgraph, transport=transport)):
+        now = time.perf_counter()
+        latencies.append(now - started)
+        started = now
+        rows += len(batch)
+    return rows, latencies
+
+def bench_enrich(args, transport):
+    # Enriching pages of swaps; the distinct pools and tokens are looked up once
+    pages = [[swap_row(i) for i in range(start, min(args.rows, start + args.page_size))]
+             for start in range(0, args.rows, args.page_size)]
+    latencies = []
+    with tempfile.TemporaryDirectory() as directory:
+        cache = forge.MetadataCache(os.path.join(directory, 'metadata.sqlite'))
+        for page in pages:
+            started = time.perf_counter()
+            forge.enrich_rows("Swap", page, cache, uncached(transport))
+            latencies.append(time.perf_counter() - started)
+    return args.rows, latencies
+
+def bench_backfill(args, transport):
+    latencies, rows = [], 0
+    started = time.perf_counter()
+    for page in forge.backfill("Swap", SWAP_FIELDS, START_TIME, START_TIME + args.rows // 3 + 1,
+                               shards=forge.BACKFILL_WORKERS, fetch=uncached(transport)):
+        now = time.perf_counter()
+        latencies.append(now - started)
+        started = now
+        rows += len(page)
+    return rows, latencies
+
+def bench_results(args, transport):
+    # What ForgeDataApp.get_query_results hands to the exporters: the typed result and its sheet rows
+    pages = [[swap_row(i) for i in range(start, min(args.rows, start + args.page_size))]
+             for start in range(0, args.rows, args.page_size)]
+    latencies = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        result = forge.QueryResult("Swap")
+        for page in pages:
+            result.add('swaps', page)
+        for _ in result.sheet_rows():
+            pass
+        latencies.append(time.perf_counter() - started)
+    return args.rows * args.repeat, latencies
+
+def bench_export(extension, args, transport):
+    result = swap_result(args.rows)
+    latencies = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'benchmark' + extension)
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            forge.export_result(result, path)
+            latencies.append(time.perf_counter() - started)
+    return args.rows * args.repeat, latencies
+
+def bench_sheets(args, transport):
+    result = swap_result(args.rows)
+    latencies = []
+    for _ in range(args.repeat):
+        service = FakeSheetsService(args.latency)
+        started = time.perf_counter()
+        sink = forge.SheetsSink(service, None, 'benchmark', 'Benchmark')
+        for key, table in result.tables.items():
+            sink.write(key, list(table.records()))
+        sink.close()
+        latencies.append(time.perf_counter() - started)
+    return args.rows * args.repeat, latencies
+
+CASES = {
+    'query_subgraph': (bench_query_subgraph, True),
+    'paginate': (bench_paginate, True),
+    'paginate_stream': (bench_paginate_stream, True),
+    'backfill': (bench_backfill, True),
+    'enrich': (bench_enrich, True),
+    'results': (bench_results, False),
+    'export_csv': (partial(bench_export, '.csv'), False),
+    'export_xlsx': (partial(bench_export, '.xlsx'), False),
+    'export_json': (partial(bench_export, '.json'), False),
+    'export_parquet': (partial(bench_export, '.parquet'), False),
+    'export_sheets': (bench_sheets, False)
+}
+
+def run_case(args):
+    bench, needs_server = CASES[args.case]
+    if args.case == 'export_parquet' and forge.pa is None:
+        return {'skipped': "pyarrow is not installed"}
+
+    mock = transport = None
+    if needs_server:
+        mock = MockSubgraph(args.rows, args.latency, args.error_rate)
+        limiter = forge.RateLimiter(rate=args.rate or None)
+        transport = forge.SubgraphTransport(mock.url, backoff_base=0.01, backoff_max=0.1, limiter=limiter)
+    try:
+        started = time.perf_counter()
+        rows, latencies = bench(args, transport)
+        elapsed = time.perf_counter() - started
+    finally:
+        if transport is not None:
+            transport.close()
+        if mock is not None:
+            mock.close()
+
+    stats = {
+        'rows': rows,
+        'seconds': elapsed,
+        'rows_per_sec': rows / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'peak_rss_mb': peak_rss_mb()
+    }
+    if mock is not None:
+        stats.update(requests=mock.requests, errors=mock.errors, bytes=mock.bytes_sent,
+                     concurrency_limit=round(limiter.limit, 2))
+    return stats
+
+# Every case runs in its own process so peak RSS belongs to that case alone
+def run_isolated(case, rows, args):
+    command = [sys.executable, os.path.abspath(__file__), '--case', case, '--rows', str(rows),
+               '--page-size', str(args.page_size), '--latency', str(args.latency),
+               '--error-rate', str(args.error_rate), '--repeat', str(args.repeat), '--rate', str(args.rate)]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        return {'error': (completed.stderr.strip().splitlines() or ['failed'])[-1]}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def regressions(stats, baseline, tolerance):
+    found = []
+    if baseline.get('rows_per_sec') and stats['rows_per_sec'] < baseline['rows_per_sec'] * (1 - tolerance):
+        found.append(f"throughput {stats['rows_per_sec']:.0f} < {baseline['rows_per_sec']:.0f} rows/s")
+    if baseline.get('p99_ms') and stats['p99_ms'] > baseline['p99_ms'] * (1 + tolerance):
+        found.append(f"p99 {stats['p99_ms']:.1f} > {baseline['p99_ms']:.1f} ms")
+    if baseline.get('peak_rss_mb') and stats.get('peak_rss_mb') and stats['peak_rss_mb'] > baseline['peak_rss_mb'] * (1 + tolerance):
+        found.append(f"peak RSS {stats['peak_rss_mb']:.0f} > {baseline['peak_rss_mb']:.0f} MB")
+    return found
+
+def format_number(value, spec):
+    return '-' if value is None else format(value, spec)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Forge Data Scraper against a local mock subgraph.")
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES), default=list(CASES), help="Cases to run (default: all)")
+    parser.add_argument('--rows', nargs='+', type=int, default=DEFAULT_ROWS, help="Result sizes to run each case at")
+    parser.add_argument('--page-size', type=int, default=forge.PAGE_SIZE, help="Rows per subgraph page")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds the mock subgraph (and fake Sheets API) waits per request")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of mock subgraph requests that fail with HTTP 503")
+    parser.add_argument('--rate', type=float, default=0, help="Client requests per second (default: 0, unlimited)")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="Runs of each in-memory case")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help=f"Baseline file (default: {BASELINE_PATH})")
+    parser.add_argument('--save-baseline', action='store_true', help="Store these results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE, help="Allowed slowdown before a case counts as a regression")
+    parser.add_argument('--case', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.case:
+        args.rows = args.rows[0]
+        print(json.dumps(run_case(args)))
+        return 0
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+
+    results, failures = {}, 0
+    print(f"{'case':<16}{'rows':>9}{'rows/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'RSS MB':>9}  vs baseline")
+    for case in args.cases:
+        for rows in args.rows:
+            key = f"{case}:{rows}"
+            stats = run_isolated(case, rows, args)
+            if 'error' in stats or 'skipped' in stats:
+                print(f"{case:<16}{rows:>9}  {stats.get('error') or 'skipped: ' + stats['skipped']}")
+                failures += 'error' in stats
+                continue
+            results[key] = stats
+            found = regressions(stats, baselines[key], args.tolerance) if key in baselines else None
+            failures += bool(found)
+            verdict = 'no baseline' if found is None else ('; '.join(found) if found else 'ok')
+            print(f"{case:<16}{rows:>9}{stats['rows_per_sec']:>12.0f}{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}"
+                  f"{format_number(stats['peak_rss_mb'], '>9.0f')}  {verdict}")
+
+    if args.save_baseline:
+        baselines.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"Saved {len(results)} baselines to {args.baseline}")
+    return 1 if failures and not args.save_baseline else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,57 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext, filedialog
+from tkinter import ttk, messagebox, scrolledtext, filedialog, simpledialog
 import requests
+from requests.adapters import HTTPAdapter
 import json
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
+from google_auth_httplib2 import AuthorizedHttp
+import httplib2
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+import argparse
+import codecs
 import csv
+from array import array
+import functools
 import pandas as pd
+import numpy as np
 import logging
 from datetime import datetime, timedelta
 import os
+import sys
+import hashlib
+import queue
+import random
+import re
+import sqlite3
+import textwrap
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Parquet and Arrow/Feather exports are optional
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+try:
+    import orjson
+except ImportError:
+    orjson = None
+# Excel exports are optional; xlsxwriter is used when installed, otherwise openpyxl
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+try:
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+except ImportError:
+    openpyxl = None
 
 # Set up logging
 logging.basicConfig(filename='forge_data_app.log', level=logging.INFO,
@@ -103,9 +144,2705 @@ SCHEMA = {
             "amount1": "Amount of token1 swapped",
             "amountUSD": "USD value of the swap"
         }
+    },
+    "Position": {
+        "description": "Liquidity positions held by a wallet",
+        "fields": {
+            "id": "Position identifier",
+            "owner": "Address of the wallet holding the position",
+            "pool": "Address of the pool the position is in",
+            "token0": "Address of the first token in the pair",
+            "token1": "Address of the second token in the pair",
+            "liquidity": "Liquidity currently held by the position",
+            "depositedToken0": "Total token0 deposited",
+            "depositedToken1": "Total token1 deposited",
+            "withdrawnToken0": "Total token0 withdrawn",
+            "withdrawnToken1": "Total token1 withdrawn",
+            "collectedFeesToken0": "Fees collected in token0",
+            "collectedFeesToken1": "Fees collected in token1"
+        }
+    }
+}
+
+# GraphQL scalar types of the numeric fields above, which the subgraph
+# sends as strings; anything not listed is an ID, address or text
+FIELD_TYPES = {
+    "date": "Int",
+    "timestamp": "BigInt",
+    "poolCount": "BigInt",
+    "txCount": "BigInt",
+    "decimals": "BigInt",
+    "totalSupply": "BigInt",
+    "feeTier": "BigInt",
+    "liquidity": "BigInt",
+    "sqrtPrice": "BigInt",
+    "totalVolumeUSD": "BigDecimal",
+    "totalFeesUSD": "BigDecimal",
+    "totalValueLockedUSD": "BigDecimal",
+    "volume": "BigDecimal",
+    "volumeUSD": "BigDecimal",
+    "feesUSD": "BigDecimal",
+    "token0Price": "BigDecimal",
+    "token1Price": "BigDecimal",
+    "open": "BigDecimal",
+    "high": "BigDecimal",
+    "low": "BigDecimal",
+    "close": "BigDecimal",
+    "amount0": "BigDecimal",
+    "amount1": "BigDecimal",
+    "amountUSD": "BigDecimal",
+    "depositedToken0": "BigDecimal",
+    "depositedToken1": "BigDecimal",
+    "withdrawnToken0": "BigDecimal",
+    "withdrawnToken1": "BigDecimal",
+    "collectedFeesToken0": "BigDecimal",
+    "collectedFeesToken1": "BigDecimal",
+    # Columns of the candles built from swaps
+    "volume0": "BigDecimal",
+    "volume1": "BigDecimal",
+    "vwap": "BigDecimal",
+    "trades": "Int",
+    # Poll time stamped on watch-mode deltas
+    "polledAt": "Int",
+    # Token metadata joined into enriched rows
+    "token0Decimals": "Int",
+    "token1Decimals": "Int"
+}
+
+# Reference fields that repeat the same few addresses across many rows
+ADDRESS_FIELDS = {"pool", "token0", "token1", "origin", "owner"}
+
+# BigInts that do not fit in int64 (uint128 liquidity, uint160 sqrtPrice, uint256 supply)
+WIDE_BIGINT_FIELDS = {"liquidity", "sqrtPrice", "totalSupply"}
+
+# BigInts that can be a full uint256 (78 digits), past decimal256's 76, so Arrow gets them as text
+UINT256_FIELDS = {"totalSupply"}
+
+# The subgraph rejects `first` values above this, so larger pulls are paged
+PAGE_SIZE = 1000
+
+# Entities that are paged by a time column instead of by id
+CURSOR_FIELDS = {
+    "Swap": "timestamp",
+    "PoolDayData": "date"
+}
+
+class SubgraphError(Exception):
+    pass
+
+def collection_name(entity):
+    # Factory -> factories, PoolDayData -> poolDayDatas
+    name = entity[0].lower() + entity[1:]
+    if name.endswith('y'):
+        return name[:-1] + 'ies'
+    return name + 's'
+
+def format_value(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, (list, tuple)):
+        return '[' + ', '.join(format_value(v) for v in value) + ']'
+    return json.dumps(str(value))
+
+def format_where(where):
+    return '{ ' + ', '.join(f'{key}: {format_value(value)}' for key, value in where.items()) + ' }'
+
+# Field the address box filters on, by entity
+ADDRESS_FILTERS = {
+    "Pool": "id",
+    "Token": "id",
+    "Swap": "origin",
+    "Position": "owner",
+    "PoolDayData": "pool"
+}
+
+def address_filter(entity, address):
+    if not address or entity not in ADDRESS_FILTERS:
+        return {}
+    return {ADDRESS_FILTERS[entity]: address}
+
+# The subgraph's schema, introspected once and kept on disk so queries can be checked
+# locally before they are sent. The cache is rebuilt when it is older than SCHEMA_TTL,
+# was written for another endpoint or by an older SCHEMA_CACHE_VERSION.
+SCHEMA_CACHE_PATH = 'forge_schema.json'
+SCHEMA_CACHE_VERSION = 1
+SCHEMA_TTL = 24 * 3600
+
+SCHEMA_QUERY = """
+query {
+  __schema {
+    types {
+      name
+      kind
+      fields { name type { kind name ofType { kind name ofType { kind name ofType { kind name } } } } }
+      inputFields { name }
+      enumValues { name }
+    }
+  }
+}
+"""
+
+# Entity references that need a sub-selection, used until the schema has been introspected
+REFERENCE_FIELDS = {
+    "Pool": {"token0", "token1"},
+    "PoolDayData": {"pool"},
+    "Swap": {"pool", "token0", "token1"},
+    "Position": {"pool", "token0", "token1"}
+}
+
+class SchemaError(ValueError):
+    pass
+
+def named_type(field_type):
+    # Strips NON_NULL/LIST wrappers; returns (kind, name, is_list)
+    is_list = False
+    while field_type['kind'] in ('NON_NULL', 'LIST'):
+        is_list = is_list or field_type['kind'] == 'LIST'
+        field_type = field_type['ofType']
+    return field_type['kind'], field_type['name'], is_list
+
+def parse_schema(data):
+    types = {t['name']: t for t in data['__schema']['types']}
+    entities = {}
+    for name, t in types.items():
+        if t['kind'] != 'OBJECT' or name.startswith('__') or name in ('Query', 'Subscription') or not t['fields']:
+            continue
+        entities[name] = {field['name']: named_type(field['type']) for field in t['fields']}
+    return {
+        'entities': entities,
+        'filters': {name: [f['name'] for f in types[f'{name}_filter']['inputFields'] or []]
+                    for name in entities if f'{name}_filter' in types},
+        'order_by': {name: [v['name'] for v in types[f'{name}_orderBy']['enumValues'] or []]
+                     for name in entities if f'{name}_orderBy' in types}
     }
+
+class SubgraphSchema:
+    def __init__(self, path=SCHEMA_CACHE_PATH, url=URL, ttl=SCHEMA_TTL):
+        self.path = path
+        self.url = url
+        self.ttl = ttl
+        # None until loaded; queries then only get the REFERENCE_FIELDS expansion
+        self.entities = None
+        self.filters = {}
+        self.order_by = {}
+
+    def read_cache(self):
+        try:
+            with open(self.path) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cached.get('version') != SCHEMA_CACHE_VERSION or cached.get('url') != self.url:
+            return None
+        return cached
+
+    def write_cache(self, cached):
+        try:
+            with open(self.path + '.tmp', 'w') as f:
+                json.dump(cached, f)
+            os.replace(self.path + '.tmp', self.path)
+        except OSError as e:
+            logging.warning(f"Could not cache the subgraph schema: {str(e)}")
+
+    def load(self, refresh=False, fetch=None):
+        cached = self.read_cache()
+        if cached is None or refresh or time.time() - cached['fetched'] > self.ttl:
+            try:
+                data = (fetch or functools.partial(query_subgraph, cache=False))(SCHEMA_QUERY)
+                cached = dict(parse_schema(data), version=SCHEMA_CACHE_VERSION, url=self.url, fetched=time.time())
+                self.write_cache(cached)
+                logging.info(f"Subgraph schema introspected: {len(cached['entities'])} entities")
+            except (SubgraphError, requests.RequestException, KeyError, TypeError, ValueError) as e:
+                # Keep working offline with a stale copy, or without validation
+                logging.warning(f"Schema introspection failed: {str(e)}")
+                if cached is None:
+                    return self
+        self.filters = cached['filters']
+        self.order_by = cached['order_by']
+        self.entities = {name: {field: tuple(kind) for field, kind in fields.items()}
+                         for name, fields in cached['entities'].items()}
+        return self
+
+    def selection(self, entity, fields):
+        # Validates field names and gives entity references an { id } sub-selection
+        if self.entities is None:
+            references = REFERENCE_FIELDS.get(entity, ())
+            return [f"{field} {{ id }}" if field in references else field for field in fields]
+        known = self.entities.get(entity)
+        if known is None:
+            raise SchemaError(f"The subgraph has no {entity} entity")
+        unknown = [field for field in fields if '{' not in field and field not in known]
+        if unknown:
+            raise SchemaError(f"{entity} has no field {', '.join(unknown)}")
+        return [f"{field} {{ id }}" if '{' not in field and known[field][0] in ('OBJECT', 'INTERFACE') else field
+                for field in fields]
+
+    def check_arguments(self, entity, where=None, order_by=None):
+        if entity in self.filters:
+            unknown = [key for key in where or {} if key not in self.filters[entity]]
+            if unknown:
+                raise SchemaError(f"{entity} cannot be filtered on {', '.join(unknown)}")
+        if order_by and entity in self.order_by and order_by not in self.order_by[entity]:
+            raise SchemaError(f"{entity} cannot be ordered by {order_by}")
+
+default_schema = SubgraphSchema()
+
+def build_query(entity, fields, limit, where=None, order_by=None, order_direction=None, alias=None):
+    fields = default_schema.selection(entity, fields)
+    default_schema.check_arguments(entity, where, order_by)
+    arguments = [f"first: {limit}"]
+    if order_by:
+        arguments.append(f"orderBy: {order_by}")
+    if order_direction:
+        arguments.append(f"orderDirection: {order_direction}")
+    if where:
+        arguments.append(f"where: {format_where(where)}")
+
+    prefix = f"{alias}: " if alias else ''
+    return f"""
+      {prefix}{collection_name(entity)}({', '.join(arguments)}) {{
+        {' '.join(fields)}
+      }}
+    """
+
+# Where finished runs record their metrics: one JSON object per line, or a Prometheus
+# textfile (node_exporter's textfile collector) holding the latest run
+METRICS_PATH = 'forge_metrics.jsonl'
+PROMETHEUS_PATH = 'forge_metrics.prom'
+
+# Wall time is split into fetch (waiting on the subgraph), decode (parsing responses),
+# transform (building the typed result) and export (writing files, sinks and sheets)
+METRIC_PHASES = ('fetch', 'decode', 'transform', 'export')
+METRIC_COUNTERS = ('requests', 'bytes', 'pages', 'rows', 'retries', 'throttled', 'cache_hits', 'cache_misses')
+
+# Counters for the current run, shared by every thread that works on it. Gauges describe
+# long-lived state (such as the rate limiter) and survive a reset.
+class QueryMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.gauges = {}
+        self.reset()
+
+    def reset(self, label=''):
+        with self.lock:
+            self.label = label
+            self.started = time.time()
+            self.clock = time.perf_counter()
+            self.seconds = dict.fromkeys(METRIC_PHASES, 0.0)
+            self.counts = dict.fromkeys(METRIC_COUNTERS, 0)
+
+    def add_time(self, phase, seconds):
+        with self.lock:
+            self.seconds[phase] += seconds
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counts[name] += amount
+
+    def set_gauges(self, **values):
+        with self.lock:
+            self.gauges.update(values)
+
+    def snapshot(self, status='done'):
+        with self.lock:
+            record = {
+                'time': datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+                'label': self.label,
+                'status': status,
+                'wall_seconds': round(time.perf_counter() - self.clock, 6)
+            }
+            record.update({f'{phase}_seconds': round(seconds, 6) for phase, seconds in self.seconds.items()})
+            record.update(self.counts)
+            record.update(self.gauges)
+        return record
+
+    def summary(self):
+        with self.lock:
+            timings = ', '.join(f"{phase} {seconds:.2f}s" for phase, seconds in self.seconds.items())
+            counts = self.counts
+            summary = (f"{timings} | {counts['pages']} pages, {counts['bytes'] / 1e6:.1f} MB, "
+                       f"{counts['retries']} retries, cache {counts['cache_hits']}/{counts['cache_hits'] + counts['cache_misses']}")
+            if 'concurrency_limit' in self.gauges:
+                summary += f" | concurrency {self.gauges['concurrency_limit']:.1f}, {self.gauges['in_flight']} in flight"
+            return summary
+
+default_metrics = QueryMetrics()
+
+def prometheus_text(record):
+    label = json.dumps(record['label'])
+    lines = [
+        "# HELP forge_query_phase_seconds Wall time of the last run by phase.",
+        "# TYPE forge_query_phase_seconds gauge"
+    ]
+    lines += [f'forge_query_phase_seconds{{label={label},phase="{phase}"}} {record[phase + "_seconds"]}'
+              for phase in METRIC_PHASES]
+    lines += [
+        "# HELP forge_query_wall_seconds Total wall time of the last run.",
+        "# TYPE forge_query_wall_seconds gauge",
+        f"forge_query_wall_seconds{{label={label}}} {record['wall_seconds']}"
+    ]
+    for name in METRIC_COUNTERS:
+        lines += [f"# TYPE forge_query_{name} gauge", f"forge_query_{name}{{label={label}}} {record[name]}"]
+    for name in LIMITER_GAUGES:
+        if name in record:
+            lines += [f"# TYPE forge_limiter_{name} gauge", f"forge_limiter_{name} {record[name]}"]
+    lines += [
+        "# TYPE forge_query_last_run_success gauge",
+        f"forge_query_last_run_success{{label={label}}} {1 if record['status'] == 'done' else 0}",
+        "# TYPE forge_query_last_run_timestamp_seconds gauge",
+        f"forge_query_last_run_timestamp_seconds{{label={label}}} {int(time.time())}"
+    ]
+    return '\n'.join(lines) + '\n'
+
+def write_metrics(record, path=METRICS_PATH):
+    if path.endswith('.prom'):
+        # Write then rename so the textfile collector never reads half a file
+        with open(path + '.tmp', 'w') as f:
+            f.write(prometheus_text(record))
+        os.replace(path + '.tmp', path)
+    else:
+        with open(path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+# HTTP transport settings; timeouts are (connect, read) seconds
+REQUEST_TIMEOUT = (10, 60)
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+POOL_SIZE = 16
+
+# Client-side limits on the subgraph endpoint. A token bucket caps requests per second
+# and an AIMD window caps requests in flight: the window grows by about one request per
+# window's worth of successes, halves on 429/5xx/timeouts and shrinks by a tenth when
+# the smoothed latency climbs past LATENCY_TOLERANCE times the best recently seen. Cuts
+# happen at most once per round trip so one burst of failures counts once.
+RATE_LIMIT = 20
+RATE_BURST = 20
+CONCURRENCY_START = 4
+CONCURRENCY_MIN = 1
+CONCURRENCY_MAX = POOL_SIZE
+LATENCY_TOLERANCE = 2.0
+LIMITER_GAUGES = ('concurrency_limit', 'in_flight', 'rate_limit', 'latency_ms', 'base_latency_ms')
+
+class RateLimiter:
+    def __init__(self, rate=RATE_LIMIT, burst=RATE_BURST, start=CONCURRENCY_START,
+                 minimum=CONCURRENCY_MIN, maximum=CONCURRENCY_MAX):
+        self.rate = rate
+        self.burst = burst
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(start)
+        self.in_flight = 0
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.latency = None
+        self.base_latency = None
+        self.last_cut = 0.0
+        self.condition = threading.Condition()
+        self.publish()
+
+    def publish(self):
+        default_metrics.set_gauges(
+            concurrency_limit=round(self.limit, 2),
+            in_flight=self.in_flight,
+            rate_limit=self.rate or 0,
+            latency_ms=round((self.latency or 0) * 1000, 1),
+            base_latency_ms=round((self.base_latency or 0) * 1000, 1)
+        )
+
+    def acquire(self):
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                if self.rate:
+                    self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.in_flight >= int(self.limit):
+                    self.condition.wait()
+                    continue
+                wait = self.paused_until - now
+                if wait <= 0 and self.rate and self.tokens < 1:
+                    wait = (1 - self.tokens) / self.rate
+                if wait <= 0:
+                    break
+                self.condition.wait(wait)
+            if self.rate:
+                self.tokens -= 1
+            self.in_flight += 1
+            self.publish()
+
+    def release(self, latency, throttled=False, retry_after=None):
+        with self.condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            can_cut = now - self.last_cut > (self.latency or latency)
+            if throttled:
+                default_metrics.count('throttled')
+                if can_cut:
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self.last_cut = now
+                if retry_after:
+                    # Everyone waits out the server's Retry-After, not just the request that got it
+                    self.paused_until = max(self.paused_until, now + min(retry_after, BACKOFF_MAX))
+            else:
+                self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+                # The baseline drifts up slowly so one lucky response does not pin it forever
+                self.base_latency = latency if self.base_latency is None else min(latency, self.base_latency * 1.005)
+                if self.latency > self.base_latency * LATENCY_TOLERANCE and can_cut:
+                    self.limit = max(self.minimum, self.limit * 0.9)
+                    self.last_cut = now
+                else:
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.publish()
+            self.condition.notify_all()
+
+default_limiter = RateLimiter()
+
+def retry_after_seconds(value):
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+# One pooled keep-alive session shared by every query, with timeouts and
+# exponential backoff (full jitter) on connection errors, timeouts and 429/5xx
+class SubgraphTransport:
+    def __init__(self, url=URL, timeout=REQUEST_TIMEOUT, max_retries=MAX_RETRIES,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX, pool_size=POOL_SIZE, limiter=None):
+        self.url = url
+        # limiter=False sends without client-side limits
+        self.limiter = default_limiter if limiter is None else limiter
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'Accept-Encoding': 'gzip, deflate', 'Connection': 'keep-alive'})
+
+    def backoff(self, attempt, retry_after=None):
+        retry_after = retry_after_seconds(retry_after)
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def send(self, query, headers=None, stream=False):
+        # One attempt, holding a limiter slot for as long as it is on the wire
+        if self.limiter:
+            self.limiter.acquire()
+        started = time.perf_counter()
+        throttled, retry_after = False, None
+        try:
+            response = self.session.post(self.url, json={'query': query}, headers=headers, timeout=self.timeout,
+                                         stream=stream)
+            throttled = response.status_code in RETRY_STATUSES
+            retry_after = retry_after_seconds(response.headers.get('Retry-After'))
+            return response
+        except (requests.ConnectionError, requests.Timeout):
+            throttled = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            default_metrics.add_time('fetch', elapsed)
+            if self.limiter:
+                self.limiter.release(elapsed, throttled, retry_after)
+
+    def request(self, query, headers=None, stream=False):
+        # The final response after retries; raises for HTTP errors. With stream=True the
+        # body is left unread for the caller (who must close the response).
+        attempt = 0
+        while True:
+            try:
+                response = self.send(query, headers, stream)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff(attempt)
+                logging.warning(f"Request failed ({str(e)}), retrying in {delay:.1f}s")
+            else:
+                default_metrics.count('requests')
+                if not stream:
+                    default_metrics.count('bytes', len(response.content))
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    if response.status_code >= 400:
+                        response.close()
+                    response.raise_for_status()
+                    return response
+                response.close()
+                delay = self.backoff(attempt, response.headers.get('Retry-After'))
+                logging.warning(f"Subgraph returned HTTP {response.status_code}, retrying in {delay:.1f}s")
+            default_metrics.count('retries')
+            time.sleep(delay)
+            attempt += 1
+
+    def decode(self, response):
+        started = time.perf_counter()
+        try:
+            return orjson.loads(response.content) if orjson is not None else response.json()
+        except ValueError as e:
+            # e.g. an HTML error page from a proxy in front of the subgraph
+            raise SubgraphError(f"The subgraph sent a response that is not JSON: {str(e)}") from e
+        finally:
+            default_metrics.add_time('decode', time.perf_counter() - started)
+
+    def post(self, query):
+        return self.decode(self.request(query))
+
+    def close(self):
+        self.session.close()
+
+default_transport = SubgraphTransport()
+
+# Response cache settings
+CACHE_PATH = 'forge_cache.sqlite'
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Seconds a cached response stays fresh, by entity; aggregates change constantly
+CACHE_TTLS = {
+    "Factory": 60,
+    "Pool": 60,
+    "Token": 300,
+    "Position": 300,
+    "Swap": 300,
+    "PoolDayData": 3600
+}
+
+# Time ranges that ended at least HISTORICAL_AGE seconds ago can no longer change
+HISTORICAL_AGE = 86400
+HISTORICAL_TTL = 30 * 86400
+
+ENTITIES_BY_COLLECTION = {collection_name(entity): entity for entity in SCHEMA}
+
+def normalize_query(query):
+    return ' '.join(query.split())
+
+# Each sub-query of a request: alias, collection and arguments
+QUERY_PART_PATTERN = re.compile(r'(?:(\w+):\s*)?(\w+)\s*\(([^)]*)\)')
+
+def historical_pages(query, data, before):
+    # True when every sub-query is a full page in ascending time order whose last row is
+    # older than `before`: rows indexed later sort after it, so the page cannot change
+    parts = QUERY_PART_PATTERN.findall(query)
+    if not parts:
+        return False
+    for alias, collection, arguments in parts:
+        first = re.search(r'first:\s*(\d+)', arguments)
+        order = re.search(r'orderBy:\s*(timestamp|date)\b', arguments)
+        rows = data.get(alias or collection)
+        if not first or not order or re.search(r'orderDirection:\s*desc', arguments):
+            return False
+        if not rows or len(rows) < int(first.group(1)):
+            return False
+        try:
+            if int(rows[-1][order.group(1)]) > before:
+                return False
+        except (KeyError, TypeError, ValueError):
+            return False
+    return True
+
+# Historical responses are the ones bounded above by a time that has passed, or full
+# pages of rows that are all that old, which covers cursor pages with no upper bound
+def cache_ttl(query, now=None, data=None):
+    now = time.time() if now is None else now
+    upper_bounds = [int(value) for value in re.findall(r'\b(?:timestamp|date)_lt: "?(\d+)', query)]
+    if upper_bounds and max(upper_bounds) <= now - HISTORICAL_AGE:
+        return HISTORICAL_TTL
+    if data and historical_pages(query, data, now - HISTORICAL_AGE):
+        return HISTORICAL_TTL
+    entities = [ENTITIES_BY_COLLECTION[name] for name in re.findall(r'(\w+)\s*\(', query)
+                if name in ENTITIES_BY_COLLECTION]
+    return min((CACHE_TTLS[entity] for entity in entities), default=min(CACHE_TTLS.values()))
+
+# Size-bounded LRU of subgraph responses in SQLite, keyed by the endpoint URL and the
+# whitespace-collapsed query text. `enabled = False` bypasses it entirely;
+# `refresh = True` skips reads but still stores fresh responses.
+class ResponseCache:
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = True
+        self.refresh = False
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.db = None
+        self.total_bytes = 0
+
+    def connect(self):
+        if self.db is None:
+            self.db = sqlite3.connect(self.path, check_same_thread=False)
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    body BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )
+            """)
+            self.db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+            self.total_bytes = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        return self.db
+
+    def key(self, query, url=''):
+        return hashlib.sha256((url + '\n' + normalize_query(query)).encode()).hexdigest()
+
+    def get(self, query, url=''):
+        if not self.enabled or self.refresh:
+            return None
+        key = self.key(query, url)
+        now = time.time()
+        with self.lock:
+            db = self.connect()
+            row = db.execute("SELECT body, expires FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] < now:
+                self.misses += 1
+                return None
+            db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            db.commit()
+            self.hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, query, data, url=''):
+        if not self.enabled:
+            return
+        body = zlib.compress(json.dumps(data, separators=(',', ':')).encode())
+        if len(body) > self.max_bytes:
+            return
+        key = self.key(query, url)
+        now = time.time()
+        with self.lock:
+            db = self.connect()
+            old = db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                       (key, body, len(body), now + cache_ttl(query, now, data), now))
+            self.total_bytes += len(body) - (old[0] if old else 0)
+            self.evict()
+            db.commit()
+
+    def evict(self):
+        # Drop expired entries first, then least recently used ones until under the size bound
+        if self.total_bytes <= self.max_bytes:
+            return
+        self.db.execute("DELETE FROM responses WHERE expires < ?", (time.time(),))
+        self.total_bytes = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        for key, size in self.db.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall():
+            if self.total_bytes <= self.max_bytes:
+                break
+            self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.total_bytes -= size
+
+    def clear(self):
+        with self.lock:
+            db = self.connect()
+            db.execute("DELETE FROM responses")
+            db.commit()
+            self.total_bytes = 0
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'bytes': self.total_bytes}
+
+default_cache = ResponseCache()
+
+# Pass cache=False to always go to the network
+def query_subgraph(query, transport=None, cache=None):
+    cache = default_cache if cache is None else cache
+    transport = transport or default_transport
+    data = cache.get(query, transport.url) if cache else None
+    if data is not None:
+        default_metrics.count('cache_hits')
+        logging.info("Query served from cache")
+        return data
+    if cache:
+        default_metrics.count('cache_misses')
+
+    logging.info(f"Sending query: {query}")
+    json_response = transport.post(query)
+
+    if 'errors' in json_response:
+        raise SubgraphError(json_response['errors'][0]['message'])
+
+    logging.info("Query successful")
+    data = json_response.get('data')
+    if cache and data is not None:
+        cache.put(query, data, transport.url)
+    return data
+
+# Streaming decode: the body is read in STREAM_CHUNK_BYTES pieces and the rows of
+# data.<collection> are handed on in batches of STREAM_BATCH_ROWS as soon as each one
+# is complete, so neither the whole body nor the whole object tree is ever held.
+STREAM_CHUNK_BYTES = 64 * 1024
+STREAM_BATCH_ROWS = 250
+
+JSON_DECODER = json.JSONDecoder()
+JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# Just enough of a pull parser to walk a subgraph response. Values are decoded with the
+# C scanner once they are complete in the buffer; consumed text is dropped on refill.
+class JsonStream:
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        if self.eof:
+            return False
+        started = time.perf_counter()
+        chunk = next(self.chunks, None)
+        default_metrics.add_time('fetch', time.perf_counter() - started)
+        try:
+            if chunk is None:
+                self.eof = True
+                text = self.decoder.decode(b'', final=True)
+            else:
+                default_metrics.count('bytes', len(chunk))
+                text = self.decoder.decode(chunk)
+        except UnicodeDecodeError as e:
+            raise SubgraphError(f"The subgraph response is not valid UTF-8: {str(e)}") from e
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            self.pos = JSON_WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                raise SubgraphError("The subgraph response ended early")
+
+    def skip(self, char):
+        if self.peek() != char:
+            raise SubgraphError(f"Expected {char!r} in the subgraph response")
+        self.pos += 1
+
+    def skip_comma(self):
+        if self.peek() == ',':
+            self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            started = time.perf_counter()
+            try:
+                value, end = JSON_DECODER.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                default_metrics.add_time('decode', time.perf_counter() - started)
+                if not self.fill():
+                    raise SubgraphError(f"The subgraph sent a response that is not JSON: {str(e)}") from e
+                continue
+            default_metrics.add_time('decode', time.perf_counter() - started)
+            # A number cut by a chunk boundary ("12|34", "1.|5", "1e|5") decodes as a shorter one
+            if (isinstance(value, (int, float)) and not isinstance(value, bool)
+                    and self.buffer[end:end + 1] in ('', '.', 'e', 'E') and self.fill()):
+                continue
+            self.pos = end
+            return value
+
+def stream_rows(stream, key):
+    stream.skip('{')
+    while stream.peek() != '}':
+        name = stream.value()
+        stream.skip(':')
+        if name == 'data' and stream.peek() == '{':
+            stream.skip('{')
+            while stream.peek() != '}':
+                field = stream.value()
+                stream.skip(':')
+                if field == key and stream.peek() == '[':
+                    stream.skip('[')
+                    while stream.peek() != ']':
+                        yield stream.value()
+                        stream.skip_comma()
+                    stream.skip(']')
+                else:
+                    stream.value()
+                stream.skip_comma()
+            stream.skip('}')
+        elif name == 'errors':
+            raise SubgraphError(stream.value()[0]['message'])
+        else:
+            stream.value()
+        stream.skip_comma()
+
+# Rows of data.<key>, in batches, straight from the response stream. Bypasses the response cache.
+def stream_subgraph(query, key, transport=None):
+    logging.info(f"Streaming query: {query}")
+    response = (transport or default_transport).request(query, stream=True)
+    try:
+        batch = []
+        for row in stream_rows(JsonStream(response.iter_content(STREAM_CHUNK_BYTES)), key):
+            batch.append(row)
+            if len(batch) >= STREAM_BATCH_ROWS:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        response.close()
+
+# A cursor is (last value, ids already seen at that value), or None before the first page
+def advance_cursor(cursor, rows, cursor_field):
+    last_value, boundary_ids = cursor or (None, [])
+    new_last = rows[-1][cursor_field]
+    if cursor_field == 'id':
+        return new_last, []
+    at_boundary = [row['id'] for row in rows if row[cursor_field] == new_last]
+    return new_last, (boundary_ids + at_boundary if new_last == last_value else at_boundary)
+
+def cursor_where(cursor, cursor_field):
+    if cursor is None:
+        return {}
+    if cursor_field == 'id':
+        return {'id_gt': cursor[0]}
+    where = {f'{cursor_field}_gte': cursor[0]}
+    if cursor[1]:
+        where['id_not_in'] = cursor[1]
+    return where
+
+def cursor_selection(entity, fields):
+    # The cursor needs id and the ordering field; returns the selection and what was added
+    selection = list(fields)
+    for required in ('id', CURSOR_FIELDS.get(entity, 'id')):
+        if required not in selection:
+            selection.append(required)
+    return selection, [field for field in selection if field not in fields]
+
+# Walks the result set with a keyset cursor instead of `skip`, yielding one page
+# at a time until `limit` rows (None for everything) or the end is reached.
+# Time-ordered entities resume with `<field>_gte` and exclude the ids already seen
+# at the boundary value, so rows sharing a timestamp are neither skipped nor repeated.
+# Pass `after` to resume from a cursor saved by an earlier run; with `state`, the cursor
+# after each yielded batch is stored in state['cursor'] so a checkpoint can save it.
+# With `fetch_rows` (e.g. stream_subgraph) each page is decoded and yielded in smaller
+# batches as it arrives.
+def paginate(entity, fields, limit=None, where=None, page_size=PAGE_SIZE, fetch=query_subgraph,
+             cancel=None, after=None, fetch_rows=None, state=None):
+    cursor_field = CURSOR_FIELDS.get(entity, 'id')
+    selection, added = cursor_selection(entity, fields)
+
+    key = collection_name(entity)
+    base_where = dict(where or {})
+    remaining = limit
+    cursor = after
+
+    while remaining is None or remaining > 0:
+        if cancel is not None and cancel.is_set():
+            return
+        first = page_size if remaining is None else min(page_size, remaining)
+        page_where = dict(base_where)
+        page_where.update(cursor_where(cursor, cursor_field))
+
+        query = "query {" + build_query(entity, selection, first, page_where, cursor_field, 'asc') + "}"
+        if fetch_rows is not None:
+            batches = fetch_rows(query, key)
+        else:
+            rows = (fetch(query) or {}).get(key) or []
+            batches = [rows] if rows else []
+
+        count = 0
+        for rows in batches:
+            cursor = advance_cursor(cursor, rows, cursor_field)
+            count += len(rows)
+            if state is not None:
+                state['cursor'] = cursor
+            if added:
+                yield [{k: v for k, v in row.items() if k not in added} for row in rows]
+            else:
+                yield rows
+        if remaining is not None:
+            remaining -= count
+
+        if count < first:
+            return
+
+# Aliased sub-queries packed into one request when fetching many wallets; the batch
+# halves whenever the endpoint rejects a request as too complex and grows back after
+# successes, up to just below the smallest size that was rejected
+WALLET_BATCH_SIZE = 25
+WALLET_BATCH_MAX = 200
+COMPLEXITY_ERRORS = ('complex', 'too many', 'too large', 'too big', 'exceed', 'timeout', 'timed out')
+
+def parse_addresses(text):
+    # Comma, semicolon or whitespace separated; duplicates dropped, order kept
+    return list(dict.fromkeys(address for address in re.split(r'[\s,;]+', text.strip()) if address))
+
+def is_complexity_error(error):
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code in (400, 413)
+    return any(marker in str(error).lower() for marker in COMPLEXITY_ERRORS)
+
+# Like paginate(), but for many filter values at once: each request carries one aliased
+# sub-query per value (w0_swaps: swaps(where: { origin: ... }), ...), every value keeps
+# its own cursor, and rows come back tagged with the value they belong to. `limit`
+# applies per value.
+def batched_pages(entity, fields, filter_field, values, limit=None, tag='wallet', page_size=PAGE_SIZE,
+                  fetch=query_subgraph, cancel=None, batch_size=WALLET_BATCH_SIZE):
+    cursor_field = CURSOR_FIELDS.get(entity, 'id')
+    selection, added = cursor_selection(entity, fields)
+    collection = collection_name(entity)
+    # Each task is [value, cursor, rows still wanted]
+    pending = [[value, None, limit] for value in values]
+    ceiling = WALLET_BATCH_MAX
+
+    while pending:
+        if cancel is not None and cancel.is_set():
+            return
+        batch = pending[:batch_size]
+        sizes = [page_size if remaining is None else min(page_size, remaining) for _, _, remaining in batch]
+        parts = []
+        for i, (value, cursor, _) in enumerate(batch):
+            where = {filter_field: value}
+            where.update(cursor_where(cursor, cursor_field))
+            parts.append(build_query(entity, selection, sizes[i], where, cursor_field, 'asc', alias=f"w{i}_{collection}"))
+
+        try:
+            data = fetch("query {" + " ".join(parts) + "}") or {}
+        except (SubgraphError, requests.HTTPError) as e:
+            if len(batch) == 1 or not is_complexity_error(e):
+                raise
+            # Never grow back to a size the endpoint has already rejected
+            ceiling = len(batch) - 1
+            batch_size = max(1, len(batch) // 2)
+            logging.warning(f"Request rejected ({str(e)}), retrying with {batch_size} sub-queries per request")
+            continue
+
+        page = []
+        unfinished = []
+        for i, (value, cursor, remaining) in enumerate(batch):
+            rows = data.get(f"w{i}_{collection}") or []
+            if rows:
+                cursor = advance_cursor(cursor, rows, cursor_field)
+                if remaining is not None:
+                    remaining -= len(rows)
+                page.extend({tag: value, **{k: v for k, v in row.items() if k not in added}} for row in rows)
+            if len(rows) == sizes[i] and (remaining is None or remaining > 0):
+                unfinished.append([value, cursor, remaining])
+        pending = unfinished + pending[len(batch):]
+        if len(batch) == batch_size:
+            batch_size = min(ceiling, batch_size * 2)
+
+        if page:
+            yield page
+
+# Most worker threads a sharded backfill starts; the rate limiter decides how many of
+# them have a request in flight at any moment
+BACKFILL_WORKERS = CONCURRENCY_MAX
+# Pages each window may fetch ahead of the consumer before it waits
+BACKFILL_BUFFER_PAGES = 4
+
+# Swap.timestamp is a BigInt and has to be sent as a string; PoolDayData.date is an Int
+def cursor_literal(cursor_field, value):
+    return str(value) if cursor_field == 'timestamp' else int(value)
+
+def time_range(entity, where=None, fetch=query_subgraph):
+    # First and last value of the entity's time column, or None when nothing matches
+    cursor_field = CURSOR_FIELDS[entity]
+    key = collection_name(entity)
+    bounds = []
+    for direction in ('asc', 'desc'):
+        query = "query {" + build_query(entity, [cursor_field], 1, where, cursor_field, direction) + "}"
+        rows = (fetch(query) or {}).get(key) or []
+        if not rows:
+            return None
+        bounds.append(int(rows[0][cursor_field]))
+    return bounds[0], bounds[1]
+
+def time_windows(start, end, shards):
+    # Split [start, end) into at most `shards` contiguous, non-overlapping windows
+    shards = max(1, min(shards, end - start))
+    step, extra = divmod(end - start, shards)
+    windows = []
+    lower = start
+    for i in range(shards):
+        upper = lower + step + (1 if i < extra else 0)
+        windows.append((lower, upper))
+        lower = upper
+    return windows
+
+# Pulls a Swap/PoolDayData range as independent time windows, each with its own
+# cursor, on a bounded thread pool. Pages are yielded in time order as they arrive;
+# windows ahead of the one being consumed hold at most BACKFILL_BUFFER_PAGES pages
+# each, so memory stays bounded however long the range. With a `limit`, the rows each
+# window has fetched so far are shared: a window asks only for what the windows
+# before it may still leave of `limit`, and stops as soon as they have all of it.
+def backfill(entity, fields, start=None, end=None, where=None, limit=None,
+             shards=BACKFILL_WORKERS, workers=BACKFILL_WORKERS, fetch=query_subgraph, cancel=None, fetch_rows=None):
+    if entity not in CURSOR_FIELDS:
+        raise ValueError(f"{entity} has no time column to shard on")
+    cursor_field = CURSOR_FIELDS[entity]
+
+    if start is None or end is None:
+        bounds = time_range(entity, where, fetch)
+        if bounds is None:
+            return
+        start = bounds[0] if start is None else start
+        end = bounds[1] + 1 if end is None else end
+    if end <= start:
+        return
+
+    stop = threading.Event()
+    windows = time_windows(start, end, shards)
+    # Rows fetched so far by each window
+    fetched = [0] * len(windows)
+    fetched_lock = threading.Lock()
+
+    def budget(index):
+        # What `limit` leaves for this window and the ones after it; earlier windows
+        # only ever fetch more, so once this reaches 0 it stays there
+        with fetched_lock:
+            return limit - sum(fetched[:index + 1])
+
+    def put(pages, item):
+        # Waits for room in the window's buffer unless the consumer has gone away
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def pull(index, window, pages):
+        window_where = dict(where or {})
+        window_where[f'{cursor_field}_gte'] = cursor_literal(cursor_field, window[0])
+        window_where[f'{cursor_field}_lt'] = cursor_literal(cursor_field, window[1])
+        try:
+            window_limit = None if limit is None else budget(index)
+            if window_limit is None or window_limit > 0:
+                for page in paginate(entity, fields, window_limit, window_where, fetch=fetch, cancel=cancel,
+                                     fetch_rows=fetch_rows):
+                    with fetched_lock:
+                        fetched[index] += len(page)
+                    if not put(pages, page):
+                        return
+                    if limit is not None and budget(index) <= 0:
+                        break
+        except Exception as e:
+            put(pages, e)
+            return
+        put(pages, None)
+
+    remaining = limit
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        buffers = []
+        for index, window in enumerate(windows):
+            pages = queue.Queue(maxsize=BACKFILL_BUFFER_PAGES)
+            executor.submit(pull, index, window, pages)
+            buffers.append(pages)
+        for pages in buffers:
+            while True:
+                rows = pages.get()
+                if rows is None:
+                    break
+                if isinstance(rows, Exception):
+                    raise rows
+                if remaining is not None:
+                    rows = rows[:remaining]
+                    remaining -= len(rows)
+                if rows:
+                    yield rows
+                if remaining == 0:
+                    return
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+# Local store settings
+STORE_PATH = 'forge_data.sqlite'
+
+# Entities that can be synced and the columns kept for them locally.
+# Swap also keeps `origin` so wallet filters work against the local copy.
+STORE_FIELDS = {
+    "Swap": list(SCHEMA["Swap"]["fields"]) + ["origin"],
+    "PoolDayData": list(SCHEMA["PoolDayData"]["fields"]),
+    "Pool": list(SCHEMA["Pool"]["fields"]),
+    "Token": list(SCHEMA["Token"]["fields"])
+}
+
+# Filter columns worth indexing, alongside the entity's time column
+STORE_INDEXES = {
+    "Swap": ["origin", "pool"],
+    "PoolDayData": ["pool"]
+}
+
+# Swaps never change once indexed, so their sync resumes strictly after the mark.
+# The latest PoolDayData keeps changing until the day ends and is fetched again,
+# and Pool/Token aggregates are re-pulled in full on every sync.
+APPEND_ONLY = {"Swap"}
+
+def store_value(value):
+    # Entity references come back as {"id": ...} when they are sub-selected
+    if isinstance(value, dict):
+        return value.get('id')
+    return value
+
+# Indexed SQLite copy of synced entities plus a per-entity, per-filter high-water mark
+class LocalStore:
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = None
+
+    def connect(self):
+        if self.db is None:
+            self.db = sqlite3.connect(self.path, check_same_thread=False)
+            for entity, fields in STORE_FIELDS.items():
+                columns = ', '.join(f'"{field}" INTEGER' if field in ('timestamp', 'date') else f'"{field}"'
+                                    for field in fields if field != 'id')
+                self.db.execute(f'CREATE TABLE IF NOT EXISTS "{entity}" (id TEXT PRIMARY KEY, {columns})')
+                cursor_field = CURSOR_FIELDS.get(entity)
+                if cursor_field:
+                    self.db.execute(f'CREATE INDEX IF NOT EXISTS "{entity}_{cursor_field}" ON "{entity}" ("{cursor_field}", id)')
+                for column in STORE_INDEXES.get(entity, []):
+                    order = f', "{cursor_field}"' if cursor_field else ''
+                    self.db.execute(f'CREATE INDEX IF NOT EXISTS "{entity}_{column}" ON "{entity}" ("{column}"{order})')
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    entity TEXT NOT NULL,
+                    scope TEXT NOT NULL,
+                    cursor TEXT,
+                    updated REAL NOT NULL,
+                    PRIMARY KEY (entity, scope)
+                )
+            """)
+            self.db.commit()
+        return self.db
+
+    def sync_cursor(self, entity, scope):
+        with self.lock:
+            row = self.connect().execute("SELECT cursor FROM sync_state WHERE entity = ? AND scope = ?",
+                                         (entity, scope)).fetchone()
+        return tuple(json.loads(row[0])) if row and row[0] else None
+
+    def sync(self, entity, where=None, cancel=None, fetch=functools.partial(query_subgraph, cache=False)):
+        # Fetches only what changed since the last sync, committing each page together
+        # with the new mark, and yields the pages as they are stored
+        fields = STORE_FIELDS[entity]
+        cursor_field = CURSOR_FIELDS.get(entity, 'id')
+        scope = json.dumps(where or {}, sort_keys=True)
+        mark = self.sync_cursor(entity, scope)
+        if entity in APPEND_ONLY:
+            position = mark
+        elif entity in CURSOR_FIELDS and mark:
+            position = (mark[0], [])
+        else:
+            position = None
+
+        columns = ', '.join(f'"{field}"' for field in fields)
+        placeholders = ', '.join('?' for _ in fields)
+        insert = f'INSERT OR REPLACE INTO "{entity}" ({columns}) VALUES ({placeholders})'
+        for page in paginate(entity, fields, None, where, fetch=fetch, cancel=cancel, after=position):
+            position = advance_cursor(position, page, cursor_field)
+            with self.lock:
+                db = self.connect()
+                db.executemany(insert, [[store_value(row.get(field)) for field in fields] for row in page])
+                db.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?)",
+                           (entity, scope, json.dumps(position), time.time()))
+                db.commit()
+            yield page
+        logging.info(f"Synced {entity} {scope} up to {position[0] if position else 'nothing new'}")
+
+    def read(self, entity, fields, limit=None, where=None, page_size=PAGE_SIZE, cancel=None):
+        # Same shape as paginate(), but served from the local copy
+        known = STORE_FIELDS[entity]
+        unknown = [name for name in list(fields) + list(where or {}) if name not in known]
+        if unknown:
+            raise ValueError(f"{entity} has no local column(s): {', '.join(unknown)}")
+
+        with self.lock:
+            self.connect()
+        columns = ', '.join(f'"{field}"' for field in fields)
+        clauses = ' AND '.join(f'"{name}" = ?' for name in (where or {}))
+        sql = f'SELECT {columns} FROM "{entity}"' + (f' WHERE {clauses}' if clauses else '')
+        sql += f' ORDER BY "{CURSOR_FIELDS.get(entity, "id")}", id'
+        params = list((where or {}).values())
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+
+        db = sqlite3.connect(self.path)
+        try:
+            rows = db.execute(sql, params)
+            while cancel is None or not cancel.is_set():
+                batch = rows.fetchmany(page_size)
+                if not batch:
+                    return
+                yield [dict(zip(fields, values)) for values in batch]
+        finally:
+            db.close()
+
+default_store = LocalStore()
+
+# Token and pool metadata for enriching rows, looked up by id in batches of
+# METADATA_BATCH (`id_in`) and kept in an in-memory LRU backed by a SQLite file.
+# Symbols, decimals and a pool's tokens never change, so cached entries do not expire.
+METADATA_PATH = 'forge_metadata.sqlite'
+METADATA_LRU_SIZE = 10000
+METADATA_BATCH = 500
+METADATA_FIELDS = {
+    "Token": ['id', 'symbol', 'name', 'decimals'],
+    "Pool": ['id', 'token0', 'token1', 'feeTier']
+}
+
+# Entities whose rows can be enriched, and the field holding their pool
+ENRICHED_POOL_FIELDS = {"Swap": "pool", "Position": "pool", "PoolDayData": "pool", "Pool": "id"}
+
+class MetadataCache:
+    def __init__(self, path=METADATA_PATH, size=METADATA_LRU_SIZE):
+        self.path = path
+        self.size = size
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.db = None
+        self.lookups = 0
+
+    def connect(self):
+        if self.db is None:
+            self.db = sqlite3.connect(self.path, check_same_thread=False)
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS metadata (
+                    entity TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    body TEXT NOT NULL,
+                    PRIMARY KEY (entity, id)
+                )
+            """)
+        return self.db
+
+    def remember(self, key, record):
+        self.memory[key] = record
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.size:
+            self.memory.popitem(last=False)
+
+    def get_many(self, entity, ids, fetch=query_subgraph):
+        # Returns {id: record}; ids the subgraph does not know are left out
+        found, missing = {}, []
+        with self.lock:
+            for id in dict.fromkeys(id for id in ids if id):
+                if (entity, id) in self.memory:
+                    self.memory.move_to_end((entity, id))
+                    if self.memory[(entity, id)] is not None:
+                        found[id] = self.memory[(entity, id)]
+                else:
+                    missing.append(id)
+            db = self.connect() if missing else None
+            for start in range(0, len(missing), METADATA_BATCH):
+                chunk = missing[start:start + METADATA_BATCH]
+                placeholders = ', '.join('?' for _ in chunk)
+                for id, body in db.execute(f"SELECT id, body FROM metadata WHERE entity = ? AND id IN ({placeholders})",
+                                           [entity] + chunk):
+                    found[id] = json.loads(body)
+                    self.remember((entity, id), found[id])
+        missing = [id for id in missing if id not in found]
+
+        for start in range(0, len(missing), METADATA_BATCH):
+            chunk = missing[start:start + METADATA_BATCH]
+            records = []
+            for page in paginate(entity, METADATA_FIELDS[entity], None, {'id_in': chunk}, fetch=fetch):
+                records.extend({name: store_value(value) for name, value in row.items()} for row in page)
+            with self.lock:
+                self.lookups += 1
+                db = self.connect()
+                db.executemany("INSERT OR REPLACE INTO metadata VALUES (?, ?, ?)",
+                               [(entity, record['id'], json.dumps(record)) for record in records])
+                db.commit()
+                for record in records:
+                    found[record['id']] = record
+                    self.remember((entity, record['id']), record)
+                # Unknown ids are remembered for this session only, so they are not asked for again
+                for id in chunk:
+                    if id not in found:
+                        self.remember((entity, id), None)
+        return found
+
+default_metadata = MetadataCache()
+
+# Adds token0/token1 symbols and decimals to each row, taking the tokens from the row
+# itself or, when it has none, from its pool
+def enrich_rows(entity, rows, cache=None, fetch=query_subgraph):
+    cache = cache or default_metadata
+    pool_field = ENRICHED_POOL_FIELDS[entity]
+    pools = cache.get_many("Pool", [store_value(row.get(pool_field)) for row in rows
+                                    if 'token0' not in row or 'token1' not in row], fetch)
+    pairs = []
+    for row in rows:
+        pool = pools.get(store_value(row.get(pool_field)), {})
+        pairs.append([store_value(row.get(side)) or pool.get(side) for side in ('token0', 'token1')])
+    tokens = cache.get_many("Token", [token for pair in pairs for token in pair], fetch)
+
+    enriched = []
+    for row, pair in zip(rows, pairs):
+        row = dict(row)
+        for side, token_id in zip(('token0', 'token1'), pair):
+            token = tokens.get(token_id, {})
+            row[f'{side}Symbol'] = token.get('symbol')
+            decimals = token.get('decimals')
+            row[f'{side}Decimals'] = int(decimals) if decimals is not None else None
+        enriched.append(row)
+    return enriched
+
+def enrich_pages(entity, pages):
+    for page in pages:
+        yield enrich_rows(entity, page) if page else page
+
+NAN = float('nan')
+
+def to_number(field, value):
+    value = store_value(value)
+    kind = FIELD_TYPES.get(field)
+    if kind == "BigDecimal":
+        return NAN if value is None else float(value)
+    if kind is not None and value is not None:
+        return int(value)
+    return value
+
+def decimal_text(value):
+    # The subgraph writes whole decimals without a fraction: "2", not "2.0"
+    text = repr(value)
+    return text[:-2] if text.endswith('.0') else text
+
+# One entity's rows, parsed once and held column by column. BigDecimal columns are
+# packed float arrays (NaN marks a missing value) that sorting, DataFrames, Arrow and
+# candles use as they are; a value whose double does not print back as the text the
+# subgraph sent keeps that text on the side, so rows() gives the text exporters the
+# exact decimal. Columns filled from floats (candles, say) come back as floats.
+# BigInts are Python ints because liquidity and sqrtPrice overflow int64.
+class ResultTable:
+    __slots__ = ('columns', 'data', 'exact', 'floats', 'row_count')
+
+    def __init__(self, columns=()):
+        self.columns = []
+        self.data = {}
+        self.exact = {}
+        self.floats = set()
+        self.row_count = 0
+        for name in columns:
+            self.add_column(name)
+
+    def add_column(self, name):
+        self.columns.append(name)
+        if FIELD_TYPES.get(name) == "BigDecimal":
+            self.data[name] = array('d', [NAN]) * self.row_count
+            self.exact[name] = {}
+        else:
+            self.data[name] = [None] * self.row_count
+
+    def extend(self, rows):
+        if not rows:
+            return
+        for name in rows[0]:
+            if name not in self.data:
+                self.add_column(name)
+        for name in self.columns:
+            if name in self.exact:
+                self.extend_decimals(name, [store_value(row.get(name)) for row in rows])
+            else:
+                self.data[name].extend([to_number(name, row.get(name)) for row in rows])
+        self.row_count += len(rows)
+
+    def extend_decimals(self, name, values):
+        column, exact = self.data[name], self.exact[name]
+        index = len(column)
+        for value in values:
+            if value is None:
+                column.append(NAN)
+            elif isinstance(value, str):
+                number = float(value)
+                column.append(number)
+                if decimal_text(number) != value:
+                    exact[index] = value
+            else:
+                column.append(value)
+                self.floats.add(name)
+            index += 1
+
+    def __len__(self):
+        return self.row_count
+
+    def column(self, name):
+        return self.data[name]
+
+    def numbers(self, name):
+        # A BigDecimal column as the packed float64 array itself, NaN where missing
+        return self.data[name]
+
+    def decimal_value(self, name, index):
+        value = self.data[name][index]
+        if value != value:
+            return None
+        if name in self.floats:
+            return value
+        return self.exact[name].get(index) or decimal_text(value)
+
+    def decimal_column(self, name):
+        # A BigDecimal column as the subgraph sent it: exact text, None where missing
+        column = self.data[name]
+        if name in self.floats:
+            return [None if value != value else value for value in column]
+        exact = self.exact[name]
+        return [None if value != value else exact.get(index) or decimal_text(value)
+                for index, value in enumerate(column)]
+
+    def rows(self):
+        # Tuples in column order
+        return zip(*(self.decimal_column(name) if name in self.exact else self.data[name] for name in self.columns))
+
+    def row(self, index):
+        return [self.decimal_value(name, index) if name in self.exact else self.data[name][index]
+                for name in self.columns]
+
+    def records(self):
+        for values in self.rows():
+            yield dict(zip(self.columns, values))
+
+    @classmethod
+    def from_dataframe(cls, frame):
+        # The reverse of to_dataframe: float columns are copied in as whole buffers
+        table = cls(frame.columns)
+        for name in table.columns:
+            if name in table.exact:
+                table.data[name].frombytes(frame[name].to_numpy(dtype=np.float64).tobytes())
+                table.floats.add(name)
+            else:
+                table.data[name] = frame[name].tolist()
+        table.row_count = len(frame)
+        return table
+
+    def to_dataframe(self):
+        # Float columns are handed to pandas as buffers, without converting row by row
+        return pd.DataFrame({name: np.frombuffer(self.data[name], dtype=np.float64)
+                             if name in self.exact else self.data[name]
+                             for name in self.columns}, columns=self.columns)
+
+# Everything a query returned, keyed like the subgraph response (swaps, positions, ...)
+class QueryResult:
+    def __init__(self, entity):
+        self.entity = entity
+        self.tables = {}
+
+    def add(self, key, rows):
+        self.tables.setdefault(key, ResultTable()).extend(rows)
+
+    def __len__(self):
+        return sum(len(table) for table in self.tables.values())
+
+    def to_json(self):
+        return {key: list(table.records()) for key, table in self.tables.items()}
+
+    def sheet_rows(self):
+        # Header plus rows; WalletOverview puts each non-empty section under a title row
+        if self.entity != "WalletOverview":
+            for table in self.tables.values():
+                yield table.columns
+                yield from table.rows()
+            return
+        first = True
+        for key, table in self.tables.items():
+            if not len(table):
+                continue
+            if not first:
+                yield []
+            first = False
+            yield [key.capitalize()]
+            yield table.columns
+            yield from table.rows()
+
+# Sinks append pages to a file as they arrive and flush + fsync after each one,
+# so memory stays flat and everything written survives a crash or a cancel.
+# position() describes what has been written so far; reopening a resumable sink with
+# resume=<that position> drops anything written after it and carries on appending.
+class CsvSink:
+    resumable = True
+
+    def __init__(self, path, sections=False, resume=None):
+        self.path = path
+        self.sections = sections
+        self.columns = {}
+        self.rows_written = 0
+        if resume:
+            self.file = open(path, 'r+', newline='')
+            self.file.truncate(resume['offset'])
+            self.file.seek(resume['offset'])
+            self.columns = resume['columns']
+            self.rows_written = resume['rows']
+        else:
+            self.file = open(path, 'w', newline='')
+        self.writer = csv.writer(self.file)
+
+    def write(self, key, rows):
+        if not rows:
+            return
+        if key not in self.columns:
+            # First page of a section fixes its header; WalletOverview sections get a title row
+            if self.sections:
+                if self.columns:
+                    self.writer.writerow([])
+                self.writer.writerow([key.capitalize()])
+            self.columns[key] = list(rows[0])
+            self.writer.writerow(self.columns[key])
+        columns = self.columns[key]
+        self.writer.writerows([[store_value(row.get(name)) for name in columns] for row in rows])
+        self.rows_written += len(rows)
+        self.checkpoint()
+
+    def checkpoint(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def position(self):
+        return {'offset': self.file.tell(), 'columns': self.columns, 'rows': self.rows_written}
+
+    def close(self):
+        self.file.close()
+
+# Newline-delimited JSON, one row per line; multi-section results tag each row with its section
+class JsonLinesSink:
+    resumable = True
+
+    def __init__(self, path, sections=False, resume=None):
+        self.path = path
+        self.sections = sections
+        self.rows_written = 0
+        if resume:
+            self.file = open(path, 'r+')
+            self.file.truncate(resume['offset'])
+            self.file.seek(resume['offset'])
+            self.rows_written = resume['rows']
+        else:
+            self.file = open(path, 'w')
+
+    def write(self, key, rows):
+        if not rows:
+            return
+        rows = [{name: store_value(value) for name, value in row.items()} for row in rows]
+        if self.sections:
+            lines = [json.dumps(dict(row, section=key)) for row in rows]
+        else:
+            lines = [json.dumps(row) for row in rows]
+        self.file.write('\n'.join(lines) + '\n')
+        self.rows_written += len(rows)
+        self.checkpoint()
+
+    def checkpoint(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def position(self):
+        return {'offset': self.file.tell(), 'rows': self.rows_written}
+
+    def close(self):
+        self.file.close()
+
+# Rows per Parquet row group / Arrow record batch
+ROW_GROUP_SIZE = 100000
+
+# Addresses are only dictionary-encoded for Parquet: an Arrow IPC file holds one
+# dictionary per column, and every streamed row group would bring a different one
+def arrow_type(field, parquet=True):
+    kind = FIELD_TYPES.get(field)
+    if field in ADDRESS_FIELDS:
+        return pa.dictionary(pa.int32(), pa.string()) if parquet else pa.string()
+    if kind == "BigDecimal":
+        return pa.float64()
+    if field in UINT256_FIELDS:
+        return pa.string()
+    if kind == "BigInt" and field in WIDE_BIGINT_FIELDS:
+        return pa.decimal256(76, 0)
+    if kind in ("Int", "BigInt"):
+        return pa.int64()
+    return pa.string()
+
+def arrow_table(table, parquet=True):
+    # Converts whole columns at once in Arrow: float columns are handed over as buffers
+    # and wide integers go straight into decimal256
+    columns = []
+    for name in table.columns:
+        column = table.column(name)
+        kind = arrow_type(name, parquet)
+        if FIELD_TYPES.get(name) == "BigDecimal":
+            columns.append(pa.array(np.frombuffer(table.numbers(name), dtype=np.float64), type=kind, from_pandas=True))
+        elif pa.types.is_dictionary(kind):
+            columns.append(pa.array(column, type=pa.string()).dictionary_encode())
+        elif name in UINT256_FIELDS:
+            columns.append(pa.array([None if value is None else str(value) for value in column], type=kind))
+        else:
+            columns.append(pa.array(column, type=kind))
+    return pa.Table.from_arrays(columns, schema=pa.schema([pa.field(name, arrow_type(name, parquet))
+                                                          for name in table.columns]))
+
+def section_path(path, key, sections):
+    # Parquet/Arrow files hold one schema, so each WalletOverview section gets its own file
+    if not sections:
+        return path
+    stem, extension = os.path.splitext(path)
+    return f"{stem}_{key}{extension}"
+
+def write_arrow(table, path):
+    data = arrow_table(table, path.lower().endswith('.parquet'))
+    if path.lower().endswith('.parquet'):
+        pq.write_table(data, path, row_group_size=ROW_GROUP_SIZE)
+    else:
+        with pa.ipc.new_file(path, data.schema) as writer:
+            writer.write_table(data, max_chunksize=ROW_GROUP_SIZE)
+
+# Buffers pages into row groups of ROW_GROUP_SIZE and appends them to a Parquet
+# or Arrow IPC (Feather v2) file; the file is only readable once closed, so an
+# interrupted pull cannot be resumed
+class ArrowSink:
+    resumable = False
+
+    def __init__(self, path, sections=False, resume=None):
+        if pa is None:
+            raise ValueError("Parquet and Arrow exports need the pyarrow package (pip install pyarrow)")
+        self.path = path
+        self.sections = sections
+        self.parquet = path.lower().endswith('.parquet')
+        self.buffers = {}
+        self.writers = {}
+        self.rows_written = 0
+
+    def write(self, key, rows):
+        if not rows:
+            return
+        if key not in self.buffers:
+            self.buffers[key] = ResultTable(rows[0])
+        self.buffers[key].extend(rows)
+        if len(self.buffers[key]) >= ROW_GROUP_SIZE:
+            self.flush(key)
+
+    def flush(self, key):
+        buffer = self.buffers[key]
+        if not len(buffer):
+            return
+        data = arrow_table(buffer, self.parquet)
+        if key not in self.writers:
+            path = section_path(self.path, key, self.sections)
+            if self.parquet:
+                self.writers[key] = pq.ParquetWriter(path, data.schema)
+            else:
+                self.writers[key] = pa.ipc.new_file(path, data.schema)
+        self.writers[key].write_table(data)
+        self.rows_written += len(buffer)
+        self.buffers[key] = ResultTable(buffer.columns)
+
+    def close(self):
+        for key in self.buffers:
+            self.flush(key)
+        for writer in self.writers.values():
+            writer.close()
+
+# Appends each section to its own table (named like the section), adding columns as
+# new fields show up. Values are stored as the subgraph sends them, like the local store.
+# Its position is the last rowid of every table, so a resume deletes rows added since.
+class SqliteSink:
+    resumable = True
+
+    def __init__(self, path, sections=False, resume=None):
+        self.path = path
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.columns = {}
+        self.rows_written = 0
+        if resume:
+            for table in self.tables():
+                self.db.execute(f'DELETE FROM "{table}" WHERE rowid > ?', (resume['rowids'].get(table, 0),))
+            self.db.commit()
+            self.rows_written = resume['rows']
+
+    def tables(self):
+        return [row[0] for row in self.db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+
+    def write(self, key, rows):
+        if not rows:
+            return
+        names = list(rows[0])
+        quoted = ', '.join(f'"{name}"' for name in names)
+        columns = self.columns.get(key)
+        if columns is None:
+            self.db.execute(f'CREATE TABLE IF NOT EXISTS "{key}" ({quoted})')
+            columns = self.columns[key] = [row[1] for row in self.db.execute(f'PRAGMA table_info("{key}")')]
+        for name in names:
+            if name not in columns:
+                self.db.execute(f'ALTER TABLE "{key}" ADD COLUMN "{name}"')
+                columns.append(name)
+        placeholders = ', '.join('?' for _ in names)
+        self.db.executemany(f'INSERT INTO "{key}" ({quoted}) VALUES ({placeholders})',
+                            [[store_value(row.get(name)) for name in names] for row in rows])
+        self.checkpoint()
+        self.rows_written += len(rows)
+
+    def checkpoint(self):
+        self.db.commit()
+
+    def position(self):
+        rowids = {table: self.db.execute(f'SELECT MAX(rowid) FROM "{table}"').fetchone()[0] or 0
+                  for table in self.tables()}
+        return {'rowids': rowids, 'rows': self.rows_written}
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+# Rows per worksheet, header included; longer sections continue on "<Section> (2)" etc.
+EXCEL_MAX_ROWS = 1048576
+
+def excel_value(field, value):
+    # Numeric fields as numbers, except integers Excel cannot hold exactly, which stay text
+    value = to_number(field, value)
+    if value is None or value != value:
+        return None
+    if isinstance(value, int) and not isinstance(value, bool) and abs(value) > 2 ** 53:
+        return str(value)
+    return value
+
+def excel_available():
+    return xlsxwriter is not None or openpyxl is not None
+
+# Writes each section to its own worksheet, streaming rows to disk as they arrive so
+# memory stays flat: xlsxwriter in constant_memory mode, or openpyxl's write-only
+# workbook when only openpyxl is installed. The workbook is only readable once
+# closed, so it cannot be resumed.
+class ExcelSink:
+    resumable = False
+
+    def __init__(self, path, sections=False, resume=None):
+        if not excel_available():
+            raise ValueError("Excel exports need the xlsxwriter or openpyxl package (pip install xlsxwriter)")
+        self.path = path
+        self.use_xlsxwriter = xlsxwriter is not None
+        if self.use_xlsxwriter:
+            self.workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+            self.header = self.workbook.add_format({'bold': True})
+        else:
+            self.workbook = openpyxl.Workbook(write_only=True)
+        self.sheets = {}
+        self.rows_written = 0
+
+    def start(self, key, columns):
+        self.sheets[key] = {'columns': list(columns), 'count': 0}
+        self.add_sheet(key)
+
+    def add_sheet(self, key):
+        sheet = self.sheets[key]
+        sheet['count'] += 1
+        name = key.capitalize() if sheet['count'] == 1 else f"{key.capitalize()} ({sheet['count']})"
+        if self.use_xlsxwriter:
+            worksheet = self.workbook.add_worksheet(name[:31])
+            worksheet.freeze_panes(1, 0)
+            worksheet.write_row(0, 0, sheet['columns'], self.header)
+        else:
+            worksheet = self.workbook.create_sheet(name[:31])
+            worksheet.freeze_panes = 'A2'
+            worksheet.append(sheet['columns'])
+        sheet['worksheet'] = worksheet
+        sheet['row'] = 1
+
+    def write(self, key, rows):
+        if not rows:
+            return
+        if key not in self.sheets:
+            self.start(key, rows[0])
+        columns = self.sheets[key]['columns']
+        self.write_rows(key, ([row.get(name) for name in columns] for row in rows))
+
+    def write_rows(self, key, rows):
+        # rows are value sequences in the section's column order
+        sheet = self.sheets[key]
+        columns = sheet['columns']
+        for values in rows:
+            if sheet['row'] == EXCEL_MAX_ROWS:
+                self.add_sheet(key)
+            cells = [excel_value(name, value) for name, value in zip(columns, values)]
+            if self.use_xlsxwriter:
+                self.write_cells(sheet['worksheet'], sheet['row'], cells)
+            else:
+                sheet['worksheet'].append([self.text_cell(sheet['worksheet'], value) if isinstance(value, str) else value
+                                           for value in cells])
+            sheet['row'] += 1
+            self.rows_written += 1
+
+    def write_cells(self, worksheet, row, cells):
+        # Typed writes, so text such as "=..." or a URL is never turned into a formula or link
+        for col, value in enumerate(cells):
+            if value is None:
+                continue
+            if isinstance(value, bool):
+                worksheet.write_boolean(row, col, value)
+            elif isinstance(value, (int, float)):
+                worksheet.write_number(row, col, value)
+            else:
+                worksheet.write_string(row, col, str(value))
+
+    def text_cell(self, worksheet, value):
+        if not value.startswith('='):
+            return value
+        cell = WriteOnlyCell(worksheet, value=value)
+        cell.data_type = 's'
+        return cell
+
+    def close(self):
+        if self.use_xlsxwriter:
+            self.workbook.close()
+        else:
+            if not self.sheets:
+                self.workbook.create_sheet()
+            self.workbook.save(self.path)
+
+SINKS = {
+    '.csv': CsvSink,
+    '.jsonl': JsonLinesSink,
+    '.ndjson': JsonLinesSink,
+    '.parquet': ArrowSink,
+    '.arrow': ArrowSink,
+    '.feather': ArrowSink,
+    '.sqlite': SqliteSink,
+    '.db': SqliteSink,
+    '.xlsx': ExcelSink
+}
+
+def open_sink(path, sections=False, resume=None):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in SINKS:
+        raise ValueError(f"Cannot stream to {extension or 'a file without an extension'}; use {', '.join(SINKS)}")
+    if resume is not None and not SINKS[extension].resumable:
+        raise ValueError(f"Interrupted {extension} exports cannot be resumed; run the query again")
+    return SINKS[extension](path, sections, resume)
+
+def write_json(result, file):
+    # Same document as json.dump(result.to_json()), written one row at a time
+    file.write('{')
+    for i, (key, table) in enumerate(result.tables.items()):
+        file.write(('' if i == 0 else ',') + f'\n  {json.dumps(key)}: [')
+        for j, record in enumerate(table.records()):
+            file.write(('\n    ' if j == 0 else ',\n    ') + json.dumps(record))
+        file.write('\n  ]' if len(table) else ']')
+    file.write('\n}\n' if result.tables else '}\n')
+
+# Google Sheets upload settings
+SHEETS_MAX_CELLS = 50000
+SHEETS_WORKERS = 4
+
+def sheet_value(value):
+    value = store_value(value)
+    if value is None or value != value:
+        return ''
+    # Sheets stores numbers as doubles; keep wider integers exact as text
+    if isinstance(value, int) and abs(value) > 2 ** 53:
+        return str(value)
+    return value
+
+def quote_sheet(name):
+    return "'" + name.replace("'", "''") + "'"
+
+def column_letter(index):
+    # 0 -> A, 25 -> Z, 26 -> AA
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+# Writes rows into one tab in chunks of at most SHEETS_MAX_CELLS cells. Chunks are
+# uploaded concurrently to explicit ranges, each thread with its own authorized
+# connection, and quota/5xx errors are retried with backoff by the client library.
+# With `incremental`, rows whose id is already in the tab's id column are skipped and
+# new ones are appended below the existing data; otherwise the tab is cleared first.
+# Incremental writes need an id column, in the result and in a non-empty tab, and the
+# tab's header must match the result's.
+class SheetsSink:
+    def __init__(self, service, credentials, spreadsheet_id, sheet_name, incremental=False, sections=False):
+        self.service = service
+        self.credentials = credentials
+        self.spreadsheet_id = spreadsheet_id
+        self.sheet_name = sheet_name
+        self.incremental = incremental
+        self.sections = sections
+        self.local = threading.local()
+        self.executor = ThreadPoolExecutor(max_workers=SHEETS_WORKERS)
+        self.pending = []
+        self.columns = {}
+        self.rows_written = 0
+        self.prepare()
+
+    def prepare(self):
+        spreadsheets = self.service.spreadsheets()
+        metadata = spreadsheets.get(spreadsheetId=self.spreadsheet_id,
+                                    fields='sheets.properties').execute(num_retries=MAX_RETRIES)
+        properties = next((sheet['properties'] for sheet in metadata.get('sheets', [])
+                           if sheet['properties']['title'] == self.sheet_name), None)
+        if properties is None:
+            request = {'addSheet': {'properties': {'title': self.sheet_name}}}
+            reply = spreadsheets.batchUpdate(spreadsheetId=self.spreadsheet_id,
+                                             body={'requests': [request]}).execute(num_retries=MAX_RETRIES)
+            properties = reply['replies'][0]['addSheet']['properties']
+        self.grid_id = properties['sheetId']
+        self.grid_rows = properties['gridProperties']['rowCount']
+        self.grid_columns = properties['gridProperties']['columnCount']
+
+        self.existing = set()
+        self.header = []
+        self.id_index = None
+        self.next_row = 1
+        if self.incremental:
+            tab = quote_sheet(self.sheet_name)
+            first = spreadsheets.values().get(spreadsheetId=self.spreadsheet_id,
+                                              range=f"{tab}!1:1").execute(num_retries=MAX_RETRIES)
+            self.header = [str(name) for name in (first.get('values') or [[]])[0]]
+            if self.header:
+                if 'id' not in self.header:
+                    raise ValueError(f"The {self.sheet_name} tab has no id column to match rows on; "
+                                     "turn off Append new rows only to replace it")
+                letter = column_letter(self.header.index('id'))
+                column = spreadsheets.values().get(spreadsheetId=self.spreadsheet_id,
+                                                   range=f"{tab}!{letter}:{letter}").execute(num_retries=MAX_RETRIES)
+                values = column.get('values', [])
+                self.existing = {str(row[0]) for row in values[1:] if row}
+                self.next_row = len(values) + 1
+        else:
+            spreadsheets.values().clear(spreadsheetId=self.spreadsheet_id,
+                                        range=quote_sheet(self.sheet_name), body={}).execute(num_retries=MAX_RETRIES)
+
+    def thread_http(self):
+        if not hasattr(self.local, 'http'):
+            self.local.http = AuthorizedHttp(self.credentials, http=httplib2.Http())
+        return self.local.http
+
+    def ensure_grid(self, rows, columns):
+        # values.batchUpdate cannot write past the tab's grid, so grow it first
+        grid_requests = []
+        if rows > self.grid_rows:
+            grow = max(rows - self.grid_rows, self.grid_rows)
+            grid_requests.append({'appendDimension': {'sheetId': self.grid_id, 'dimension': 'ROWS', 'length': grow}})
+            self.grid_rows += grow
+        if columns > self.grid_columns:
+            grid_requests.append({'appendDimension': {'sheetId': self.grid_id, 'dimension': 'COLUMNS',
+                                                  'length': columns - self.grid_columns}})
+            self.grid_columns = columns
+        if grid_requests:
+            self.service.spreadsheets().batchUpdate(spreadsheetId=self.spreadsheet_id,
+                                                    body={'requests': grid_requests}).execute(num_retries=MAX_RETRIES)
+
+    def upload(self, request):
+        return request.execute(http=self.thread_http(), num_retries=MAX_RETRIES)
+
+    def new_rows(self, rows):
+        # The first rows passed in start with the header; later calls are data only
+        fresh = []
+        if self.id_index is None:
+            if not rows:
+                return fresh
+            header, rows = [str(name) for name in rows[0]], rows[1:]
+            if 'id' not in header:
+                raise ValueError("Append new rows only matches rows by id; select the id field or turn it off")
+            if self.header and self.header != header:
+                raise ValueError(f"The {self.sheet_name} tab has different columns ({', '.join(self.header)}); "
+                                 "turn off Append new rows only to replace it")
+            self.id_index = header.index('id')
+            if not self.header:
+                fresh.append(header)
+        for row in rows:
+            row_id = str(row[self.id_index]) if len(row) > self.id_index else ''
+            if row_id and row_id not in self.existing:
+                self.existing.add(row_id)
+                fresh.append(row)
+        return fresh
+
+    def write_values(self, rows):
+        rows = [[sheet_value(value) for value in row] for row in rows]
+        if self.incremental:
+            rows = self.new_rows(rows)
+        if not rows:
+            return
+        width = max(1, max(len(row) for row in rows))
+        chunk_size = max(1, SHEETS_MAX_CELLS // width)
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            self.ensure_grid(self.next_row + len(chunk) - 1, width)
+            body = {
+                'valueInputOption': 'USER_ENTERED',
+                'data': [{'range': f"{quote_sheet(self.sheet_name)}!A{self.next_row}", 'values': chunk}]
+            }
+            request = self.service.spreadsheets().values().batchUpdate(spreadsheetId=self.spreadsheet_id, body=body)
+            # Keep a bounded number of uploads in flight
+            if len(self.pending) >= SHEETS_WORKERS * 2:
+                self.pending.pop(0).result()
+            self.pending.append(self.executor.submit(self.upload, request))
+            self.next_row += len(chunk)
+            self.rows_written += len(chunk)
+
+    def write(self, key, rows):
+        # Same page interface as the file sinks
+        if not rows:
+            return
+        values = []
+        if key not in self.columns:
+            if self.sections:
+                if self.columns:
+                    values.append([])
+                values.append([key.capitalize()])
+            self.columns[key] = list(rows[0])
+            values.append(self.columns[key])
+        columns = self.columns[key]
+        values.extend([row.get(name) for name in columns] for row in rows)
+        self.write_values(values)
+
+    def close(self):
+        try:
+            for future in self.pending:
+                future.result()
+        finally:
+            self.executor.shutdown(wait=True)
+
+def write_csv(result, path):
+    with open(path, 'w', newline='') as csvfile:
+        csv.writer(csvfile).writerows(result.sheet_rows())
+
+def write_excel(result, path):
+    # One worksheet per table, e.g. Swaps and Positions for a WalletOverview
+    sink = ExcelSink(path)
+    try:
+        for key, table in result.tables.items():
+            sink.start(key, table.columns)
+            sink.write_rows(key, table.rows())
+    finally:
+        sink.close()
+
+def write_arrow_result(result, path):
+    if pa is None:
+        raise ValueError("Parquet and Arrow exports need the pyarrow package (pip install pyarrow)")
+    sections = result.entity == "WalletOverview"
+    for key, table in result.tables.items():
+        if len(table) or not sections:
+            write_arrow(table, section_path(path, key, sections))
+
+def write_json_file(result, path):
+    with open(path, 'w') as jsonfile:
+        write_json(result, jsonfile)
+
+# Exports of a finished, in-memory result, by file extension
+EXPORTERS = {
+    '.csv': write_csv,
+    '.xlsx': write_excel,
+    '.json': write_json_file,
+    '.parquet': write_arrow_result,
+    '.arrow': write_arrow_result,
+    '.feather': write_arrow_result
+}
+
+def export_result(result, path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in EXPORTERS:
+        raise ValueError(f"Cannot export to {extension or 'a file without an extension'}; use {', '.join(EXPORTERS)}")
+    EXPORTERS[extension](result, path)
+
+# Fields fetched for each part of a WalletOverview
+WALLET_FIELDS = {
+    "Swap": ['id', 'timestamp', 'pool', 'token0', 'token1', 'amount0', 'amount1', 'amountUSD'],
+    "Position": ['id', 'owner', 'pool', 'token0', 'token1', 'liquidity', 'depositedToken0', 'depositedToken1', 'withdrawnToken0', 'withdrawnToken1', 'collectedFeesToken0', 'collectedFeesToken1']
 }
 
+def parse_count(value, name, empty):
+    value = str(value if value is not None else '').strip()
+    if not value:
+        return empty
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a whole number.")
+
+# Turns a configuration as written by "Save Query Configuration" into
+# (result key, page iterator) jobs. Raises ValueError for an unusable configuration.
+# With a Checkpoint, paginated jobs continue from the cursor it saved and keep it
+# up to date; other jobs are restarted whole if they had not finished.
+def config_jobs(config, cancel=None, use_local_store=False, fetch=query_subgraph, stream=False, checkpoint=None):
+    entity = config.get('entity')
+    address = (config.get('address') or '').strip()
+    limit = parse_count(config.get('limit'), "Limit", None)
+    selected = [field for field, enabled in config.get('fields', {}).items() if enabled]
+    enrich = bool(config.get('enrich')) and entity in list(ENRICHED_POOL_FIELDS) + ["WalletOverview"]
+
+    def resume(part, limit):
+        # (limit, paginate arguments) for the rest of a checkpointed job
+        if checkpoint is None:
+            return limit, {}
+        job = checkpoint.job(collection_name(part))
+        job['resumable'] = True
+        if limit is not None:
+            limit = max(0, limit - job['rows'])
+        return limit, {'after': tuple(job['cursor']) if job['cursor'] else None, 'state': job}
+
+    if entity == "WalletOverview":
+        wallets = parse_addresses(address)
+        if not wallets:
+            raise ValueError("Please enter a wallet address.")
+        parts = [(part, fields) for part, fields in WALLET_FIELDS.items() if part in selected]
+        # Checked against the schema up front so a bad selection fails before any request
+        for part, fields in parts:
+            default_schema.selection(part, fields)
+        if len(wallets) == 1:
+            # One wallet keeps a plain cursor, so a checkpoint can resume it mid-way; its rows
+            # are tagged like the batched ones so the columns do not depend on the wallet count
+            jobs = []
+            for part, fields in parts:
+                part_limit, resumed = resume(part, limit)
+                pages = paginate(part, fields, part_limit, address_filter(part, wallets[0]),
+                                 fetch=fetch, cancel=cancel, **resumed)
+                jobs.append((part, tagged_pages(pages, 'wallet', wallets[0])))
+        else:
+            # Many wallets are packed into aliased sub-queries and tagged with their wallet
+            jobs = [(part, batched_pages(part, fields, ADDRESS_FILTERS[part], wallets, limit, fetch=fetch, cancel=cancel))
+                    for part, fields in parts]
+        return [(collection_name(part), enrich_pages(part, pages) if enrich else pages) for part, pages in jobs]
+
+    if entity not in SCHEMA:
+        raise ValueError("Please select an entity to query.")
+    fields = [field for field in SCHEMA[entity]['fields'] if field in selected]
+    if not fields:
+        raise ValueError("Please select at least one field to query.")
+    shards = parse_count(config.get('shards'), "Parallel shards", 1)
+
+    where = address_filter(entity, address)
+    if use_local_store and entity in STORE_FIELDS:
+        pages = default_store.read(entity, fields, limit, where, cancel=cancel)
+    else:
+        default_schema.selection(entity, fields)
+        default_schema.check_arguments(entity, where)
+        fetch_rows = stream_subgraph if stream else None
+        if shards > 1 and entity in CURSOR_FIELDS:
+            pages = backfill(entity, fields, where=where, limit=limit, shards=shards,
+                             workers=min(shards, BACKFILL_WORKERS), fetch=fetch, cancel=cancel, fetch_rows=fetch_rows)
+        else:
+            limit, resumed = resume(entity, limit)
+            pages = paginate(entity, fields, limit, where, fetch=fetch, cancel=cancel, fetch_rows=fetch_rows, **resumed)
+    return [(collection_name(entity), enrich_pages(entity, pages) if enrich else pages)]
+
+def tagged_pages(pages, tag, value):
+    # Puts `tag` first in every row, as batched_pages does
+    for page in pages:
+        yield [{tag: value, **row} for row in page]
+
+CHECKPOINT_SUFFIX = '.checkpoint.json'
+CHECKPOINT_VERSION = 1
+
+def checkpoint_path(sink_path):
+    return sink_path + CHECKPOINT_SUFFIX
+
+# Progress of a pull streamed into a sink, saved next to the output file as
+# <output>.checkpoint.json: the configuration, the sink's position and, per result key,
+# the last cursor, rows written and whether the job finished. Each save replaces the
+# file atomically, so a crash leaves either the previous or the new checkpoint.
+class Checkpoint:
+    def __init__(self, sink_path, config, stream=False, data=None, use_local_store=False):
+        self.path = checkpoint_path(sink_path)
+        self.data = data or {'version': CHECKPOINT_VERSION, 'sink': sink_path, 'config': config,
+                             'stream': stream, 'use_local_store': use_local_store, 'sink_state': None, 'jobs': {}}
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        if data.get('version') != CHECKPOINT_VERSION or 'sink' not in data:
+            raise ValueError(f"{path} is not a checkpoint this version can resume")
+        return cls(data['sink'], data['config'], data=data)
+
+    @property
+    def sink_path(self):
+        return self.data['sink']
+
+    @property
+    def config(self):
+        return self.data['config']
+
+    @property
+    def stream(self):
+        return self.data['stream']
+
+    @property
+    def use_local_store(self):
+        return self.data.get('use_local_store', False)
+
+    @property
+    def sink_state(self):
+        return self.data['sink_state']
+
+    def job(self, key):
+        return self.data['jobs'].setdefault(key, {'cursor': None, 'rows': 0, 'done': False, 'resumable': False})
+
+    def rows(self):
+        return sum(job['rows'] for job in self.data['jobs'].values())
+
+    def save(self, sink):
+        self.data['sink_state'] = sink.position()
+        self.data['updated'] = int(time.time())
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(self.data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+# Writes every page of every job to the sink and returns the number of rows written.
+# With a checkpoint, finished jobs are skipped, each page of a resumable job is saved
+# as soon as the sink has it, and other jobs are saved when they finish.
+def write_jobs(jobs, sink, checkpoint=None, cancel=None, on_page=None):
+    rows = 0
+    for key, pages in jobs:
+        job = checkpoint.job(key) if checkpoint is not None else None
+        if job is not None and job['done']:
+            continue
+        for page in pages:
+            started = time.perf_counter()
+            sink.write(key, page)
+            default_metrics.add_time('export', time.perf_counter() - started)
+            default_metrics.count('pages')
+            rows += len(page)
+            if job is not None:
+                job['rows'] += len(page)
+                if job['resumable']:
+                    checkpoint.save(sink)
+            if on_page is not None:
+                on_page(key, page)
+            if cancel is not None and cancel.is_set():
+                return rows
+        if cancel is not None and cancel.is_set():
+            return rows
+        if job is not None:
+            job['done'] = True
+            checkpoint.save(sink)
+    return rows
+
+def run_config(path, out_dir, extension, stream=False, resume=False):
+    # Runs one saved configuration headlessly; streamable formats never hold the full result.
+    # Resumable sinks are checkpointed, and with `resume` a run interrupted earlier
+    # continues from its checkpoint instead of starting over.
+    with open(path) as f:
+        config = json.load(f)
+    out_path = os.path.join(out_dir, os.path.splitext(os.path.basename(path))[0] + extension)
+
+    rows = 0
+    if extension in SINKS:
+        checkpoint = None
+        if resume and os.path.exists(checkpoint_path(out_path)):
+            checkpoint = Checkpoint.load(checkpoint_path(out_path))
+            if checkpoint.config != config:
+                logging.warning(f"{path} changed since {out_path} was interrupted; resuming with the saved configuration")
+            config, stream = checkpoint.config, checkpoint.stream
+            logging.info(f"Resuming {out_path} after {checkpoint.rows()} rows")
+        elif SINKS[extension].resumable:
+            checkpoint = Checkpoint(out_path, config, stream)
+        use_local_store = checkpoint is not None and checkpoint.use_local_store
+        jobs = config_jobs(config, use_local_store=use_local_store, stream=stream, checkpoint=checkpoint)
+        sink = open_sink(out_path, config.get('entity') == "WalletOverview",
+                         checkpoint.sink_state if checkpoint is not None else None)
+        try:
+            if checkpoint is not None and checkpoint.sink_state is None:
+                checkpoint.save(sink)
+            rows = write_jobs(jobs, sink, checkpoint)
+        finally:
+            sink.close()
+        if checkpoint is not None:
+            checkpoint.remove()
+    else:
+        jobs = config_jobs(config, stream=stream)
+        result = QueryResult(config.get('entity'))
+        for key, pages in jobs:
+            result.add(key, [])
+            for page in pages:
+                started = time.perf_counter()
+                result.add(key, page)
+                default_metrics.add_time('transform', time.perf_counter() - started)
+                default_metrics.count('pages')
+        rows = len(result)
+        started = time.perf_counter()
+        export_result(result, out_path)
+        default_metrics.add_time('export', time.perf_counter() - started)
+    default_metrics.count('rows', rows)
+    return out_path, rows
+
+def run_batch(config_paths, out_dir, extension, workers, metrics_path=None, stream=False, resume=False):
+    default_metrics.reset(' '.join(os.path.basename(path) for path in config_paths))
+    default_schema.load()
+    failures = run_configs(config_paths, out_dir, extension, workers, stream, resume)
+    if metrics_path:
+        write_metrics(default_metrics.snapshot('failed' if failures else 'done'), metrics_path)
+    return failures
+
+def run_configs(config_paths, out_dir, extension, workers, stream=False, resume=False):
+    os.makedirs(out_dir, exist_ok=True)
+    failures = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_config, path, out_dir, extension, stream, resume): path for path in config_paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                out_path, rows = future.result()
+            except (SubgraphError, requests.RequestException, sqlite3.Error, OSError, ValueError, KeyError) as e:
+                failures += 1
+                logging.error(f"Batch run of {path} failed: {str(e)}")
+                print(f"{path}: failed: {str(e)}", file=sys.stderr)
+            else:
+                logging.info(f"Batch run of {path} wrote {rows} rows to {out_path}")
+                print(f"{path}: {rows} rows -> {out_path}")
+    return failures
+
+# Watch mode re-runs a query every few seconds and passes on only the rows that are new
+# or changed since the previous poll, stamped with the poll time
+WATCH_INTERVAL = 30
+
+# fetch= for repeated polls of the same queries. Responses are revalidated with the
+# server's ETag when it sends one, and a body identical to the previous poll's is not
+# decoded again; `changed` tells the caller whether anything differed this poll.
+class ConditionalFetch:
+    def __init__(self, transport=None):
+        self.transport = transport
+        self.previous = {}
+        self.changed = False
+
+    def __call__(self, query):
+        transport = self.transport or default_transport
+        etag, digest, data = self.previous.get(query, (None, None, None))
+        response = transport.request(query, {'If-None-Match': etag} if etag else None)
+        if response.status_code == 304 and data is not None:
+            default_metrics.count('cache_hits')
+            return data
+        body_digest = hashlib.blake2b(response.content, digest_size=16).digest()
+        if body_digest == digest:
+            default_metrics.count('cache_hits')
+            return data
+
+        default_metrics.count('cache_misses')
+        json_response = transport.decode(response)
+        if 'errors' in json_response:
+            raise SubgraphError(json_response['errors'][0]['message'])
+        data = json_response.get('data')
+        self.previous[query] = (response.headers.get('ETag'), body_digest, data)
+        self.changed = True
+        return data
+
+def row_digest(row):
+    return hashlib.blake2b(json.dumps(row, sort_keys=True, default=str).encode(), digest_size=16).digest()
+
+# Yields (result key, [changed rows]) jobs for query_worker, one round per poll, until
+# cancelled. The first poll passes on every row. A poll that still fails after the
+# transport's retries is logged (and passed to on_error) and skipped, and the next one
+# runs on schedule.
+def watch(config, interval=WATCH_INTERVAL, cancel=None, fetch=None, on_error=None):
+    config = dict(config, fields=dict(config.get('fields', {}), id=True))
+    fetch = fetch or ConditionalFetch()
+    cancel = cancel or threading.Event()
+    seen = {}
+    while not cancel.is_set():
+        fetch.changed = False
+        polled = []
+        try:
+            for key, pages in config_jobs(config, cancel, fetch=fetch):
+                polled.append((key, [row for page in pages for row in page]))
+        except (SubgraphError, requests.RequestException) as e:
+            logging.warning(f"Watch poll failed, retrying in {interval}s: {str(e)}")
+            if on_error is not None:
+                on_error(e)
+            cancel.wait(interval)
+            continue
+        if fetch.changed:
+            polled_at = int(time.time())
+            for key, rows in polled:
+                changed = []
+                for row in rows:
+                    digest = row_digest(row)
+                    if seen.get((key, row.get('id'))) != digest:
+                        seen[(key, row.get('id'))] = digest
+                        changed.append(dict(row, polledAt=polled_at))
+                if changed:
+                    logging.info(f"Watch: {len(changed)} changed {key}")
+                    yield key, [changed]
+        cancel.wait(interval)
+
+def run_watch(config_path, out_path, interval):
+    with open(config_path) as f:
+        config = json.load(f)
+    default_schema.load()
+    sink = open_sink(out_path, config.get('entity') == "WalletOverview")
+
+    def failed(e):
+        print(f"{time.strftime('%H:%M:%S')} poll failed, retrying in {interval}s: {str(e)}", file=sys.stderr, flush=True)
+
+    try:
+        for key, pages in watch(config, interval, on_error=failed):
+            for page in pages:
+                sink.write(key, page)
+                print(f"{time.strftime('%H:%M:%S')} {len(page)} changed {key} -> {out_path}", flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sink.close()
+    return 0
+
+# Candle intervals accept any <number><s|m|h|d>, e.g. 1m, 5m, 1h, 1d
+INTERVAL_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# Daily candles and PoolDayData count as matching within this relative difference
+CANDLE_TOLERANCE = 0.01
+
+def parse_interval(interval):
+    match = re.fullmatch(r'\s*(\d+)\s*([smhd])\s*', interval.lower())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid interval {interval!r}; use e.g. 1m, 5m, 1h or 1d")
+    return int(match.group(1)) * INTERVAL_UNITS[match.group(2)]
+
+# OHLCV candles per pool from raw swaps, computed with pandas group-bys over whole
+# columns. The price of a swap is |amount1 / amount0| (token0 priced in token1), so
+# VWAP is simply volume1 / volume0 for the bucket. Swaps without a pool column are
+# treated as one pool.
+def build_candles(swaps, interval='1h'):
+    seconds = parse_interval(interval)
+    missing = [name for name in ('timestamp', 'amount0', 'amount1') if name not in swaps.columns]
+    if missing:
+        raise ValueError(f"Candles need the swap fields {', '.join(missing)}")
+
+    timestamp = swaps['timestamp'].astype('int64')
+    volume0 = swaps['amount0'].astype('float64').abs()
+    volume1 = swaps['amount1'].astype('float64').abs()
+    frame = pd.DataFrame({
+        'pool': swaps['pool'] if 'pool' in swaps.columns else '',
+        'timestamp': (timestamp // seconds) * seconds,
+        'time': timestamp,
+        'price': volume1 / volume0,
+        'volume0': volume0,
+        'volume1': volume1,
+        'volumeUSD': swaps['amountUSD'].astype('float64').abs() if 'amountUSD' in swaps.columns else np.nan
+    })
+    frame = frame[volume0 > 0].sort_values(['pool', 'time'], kind='stable')
+
+    candles = frame.groupby(['pool', 'timestamp'], sort=True).agg(
+        open=('price', 'first'),
+        high=('price', 'max'),
+        low=('price', 'min'),
+        close=('price', 'last'),
+        volume0=('volume0', 'sum'),
+        volume1=('volume1', 'sum'),
+        volumeUSD=('volumeUSD', 'sum'),
+        trades=('price', 'size')
+    )
+    candles['vwap'] = candles['volume1'] / candles['volume0']
+    return candles.reset_index()
+
+# Compares daily candles with the subgraph's own PoolDayData for the same pools and days.
+# Returns one row per day with relative differences and whether they are within tolerance.
+# Only prices are compared: PoolDayData.txCount also counts mints and burns. The candles
+# have to come from every swap of each day (no wallet filter, no limit) to be comparable.
+def compare_daily_candles(candles, pool_day_datas, tolerance=CANDLE_TOLERANCE):
+    days = pool_day_datas.rename(columns={'date': 'timestamp'})
+    joined = candles.merge(days, on=['pool', 'timestamp'], how='inner', suffixes=('', '_subgraph'))
+    checks = pd.DataFrame({'pool': joined['pool'], 'timestamp': joined['timestamp']})
+    for name, subgraph_name in (('close', 'close_subgraph'), ('high', 'high_subgraph'), ('low', 'low_subgraph')):
+        if subgraph_name in joined.columns:
+            expected = joined[subgraph_name].astype('float64')
+            checks[f'{name}_diff'] = (joined[name].astype('float64') - expected).abs() / expected.abs().replace(0, np.nan)
+    diff_columns = [column for column in checks.columns if column.endswith('_diff')]
+    checks['matches'] = (checks[diff_columns].fillna(0) <= tolerance).all(axis=1)
+    return checks
+
+def fetch_pool_day_datas(pools, start, end, fetch=query_subgraph, cancel=None):
+    fields = ['pool', 'date', 'high', 'low', 'close']
+    where = {'pool_in': list(pools), 'date_gte': int(start), 'date_lt': int(end)}
+    table = ResultTable()
+    for page in paginate("PoolDayData", fields, None, where, fetch=fetch, cancel=cancel):
+        table.extend(page)
+    return table.to_dataframe() if len(table) else pd.DataFrame(columns=fields)
+
+def candles_result(candles):
+    result = QueryResult("Candle")
+    result.tables['candles'] = ResultTable.from_dataframe(candles)
+    return result
+
+# How often the GUI drains the worker's result queue
+QUEUE_POLL_MS = 100
+
+# Runs on a background thread so the Tk event loop never blocks on the network.
+# Everything goes back to the GUI through `results`; Tk must not be touched here.
+# Pages are parsed into `result` here as well, so the GUI thread only renders them,
+# unless a sink is given, in which case pages go straight to the file and only
+# their row counts are reported back.
+def query_worker(jobs, result, results, cancel, sink=None, checkpoint=None):
+    def written(key, page):
+        default_metrics.count('rows', len(page))
+        results.put(('written', key, len(page)))
+
+    try:
+        try:
+            if sink is not None:
+                write_jobs(jobs, sink, checkpoint, cancel, written)
+            else:
+                for key, pages in jobs:
+                    result.add(key, [])
+                    results.put(('rows', key, []))
+                    for page in pages:
+                        default_metrics.count('pages')
+                        default_metrics.count('rows', len(page))
+                        started = time.perf_counter()
+                        result.add(key, page)
+                        default_metrics.add_time('transform', time.perf_counter() - started)
+                        results.put(('rows', key, page))
+                        if cancel.is_set():
+                            break
+                    if cancel.is_set():
+                        break
+        finally:
+            if sink is not None:
+                started = time.perf_counter()
+                sink.close()
+                default_metrics.add_time('export', time.perf_counter() - started)
+        # A finished pull needs no checkpoint; a cancelled or failed one keeps it for resuming
+        if checkpoint is not None and not cancel.is_set():
+            checkpoint.remove()
+        results.put(('done',))
+    except SubgraphError as e:
+        logging.error(f"Query error: {str(e)}")
+        results.put(('error', "Query Error", f"The subgraph returned an error: {str(e)}"))
+    except SchemaError as e:
+        logging.error(f"Invalid query: {str(e)}")
+        results.put(('error', "Invalid Query", str(e)))
+    except requests.RequestException as e:
+        logging.error(f"Request error: {str(e)}")
+        results.put(('error', "Request Error", f"An error occurred while querying the subgraph: {str(e)}"))
+    except sqlite3.Error as e:
+        logging.error(f"Local store error: {str(e)}")
+        results.put(('error', "Local Store Error", f"An error occurred in the local store: {str(e)}"))
+    except OSError as e:
+        logging.error(f"Export error: {str(e)}")
+        results.put(('error', "Export Error", f"An error occurred while writing the export: {str(e)}"))
+    except Exception as e:
+        # Anything else still ends the query, so the window never waits on a dead worker
+        logging.exception("Query failed")
+        results.put(('error', "Query Error", f"The query failed unexpectedly: {str(e)}"))
+
+def sort_key(value):
+    # Missing values (None or NaN) sort last
+    missing = value is None or value != value
+    return (missing, 0 if missing else value)
+
+# Treeview that only ever holds the rows currently on screen. Scrolling and sorting
+# move a window over the in-memory ResultTable instead of inserting every row.
+class ResultGrid(ttk.Frame):
+    def __init__(self, master):
+        super().__init__(master)
+        self.table = None
+        self.order = None
+        self.sort_column = None
+        self.sort_descending = False
+        self.offset = 0
+        self.visible = 20
+
+        self.tree = ttk.Treeview(self, show='headings', selectmode='browse')
+        self.scrollbar = ttk.Scrollbar(self, orient='vertical', command=self.on_scrollbar)
+        self.xscrollbar = ttk.Scrollbar(self, orient='horizontal', command=self.tree.xview)
+        self.tree.configure(xscrollcommand=self.xscrollbar.set)
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        self.xscrollbar.grid(row=1, column=0, sticky="ew")
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        self.tree.bind("<Configure>", self.on_resize)
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll_to(self.offset - (3 if e.delta > 0 else -3)))
+        self.tree.bind("<Button-4>", lambda e: self.scroll_to(self.offset - 3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll_to(self.offset + 3))
+        self.tree.bind("<Prior>", lambda e: self.scroll_to(self.offset - self.visible))
+        self.tree.bind("<Next>", lambda e: self.scroll_to(self.offset + self.visible))
+
+    def set_table(self, table):
+        self.table = table
+        self.order = None
+        self.sort_column = None
+        self.offset = 0
+        self.tree['columns'] = []
+        self.refresh()
+
+    def refresh(self):
+        # Call after rows were appended to the table
+        if self.table is not None and list(self.tree['columns']) != self.table.columns:
+            self.tree['columns'] = self.table.columns
+            for name in self.table.columns:
+                self.tree.heading(name, text=name, command=lambda c=name: self.sort_by(c))
+                self.tree.column(name, width=120, stretch=False)
+        if self.order is not None and len(self.order) != len(self.table):
+            # Rows arrived after sorting; fall back to arrival order
+            self.order = None
+            self.sort_column = None
+        self.render()
+
+    def on_resize(self, event):
+        row_height = int(ttk.Style().lookup('Treeview', 'rowheight') or 20)
+        visible = max(1, event.height // row_height - 1)
+        if visible != self.visible:
+            self.visible = visible
+            self.render()
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if self.table is None:
+            return
+        if action == 'moveto':
+            self.scroll_to(int(float(amount) * len(self.table)))
+        elif unit == 'pages':
+            self.scroll_to(self.offset + int(amount) * self.visible)
+        else:
+            self.scroll_to(self.offset + int(amount))
+
+    def scroll_to(self, offset):
+        self.offset = offset
+        self.render()
+
+    def render(self):
+        self.tree.delete(*self.tree.get_children())
+        total = len(self.table) if self.table is not None else 0
+        self.offset = max(0, min(self.offset, total - self.visible))
+        end = min(total, self.offset + self.visible)
+        for position in range(self.offset, end):
+            index = self.order[position] if self.order is not None else position
+            self.tree.insert('', tk.END, values=['' if value is None else value for value in self.table.row(index)])
+        if total:
+            self.scrollbar.set(self.offset / total, end / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def sort_by(self, name):
+        self.sort_descending = not self.sort_descending if name == self.sort_column else False
+        self.sort_column = name
+        # Decimals sort by value, not by their text
+        numeric = FIELD_TYPES.get(name) == "BigDecimal"
+        column = self.table.numbers(name) if numeric else self.table.column(name)
+        try:
+            # The plain key runs in C; missing values need the slower wrapper
+            if numeric and any(value != value for value in column):
+                raise TypeError
+            self.order = sorted(range(len(column)), key=column.__getitem__, reverse=self.sort_descending)
+        except TypeError:
+            self.order = sorted(range(len(column)), key=lambda i: sort_key(column[i]), reverse=self.sort_descending)
+        for heading in self.table.columns:
+            arrow = (' ▼' if self.sort_descending else ' ▲') if heading == name else ''
+            self.tree.heading(heading, text=heading + arrow)
+        self.offset = 0
+        self.render()
+
 class ForgeDataApp(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -119,7 +2856,17 @@ class ForgeDataApp(tk.Tk):
         self.query_frame = ttk.Frame(self.notebook)
         self.notebook.add(self.query_frame, text="Custom Query")
 
+        self.query_thread = None
+        self.cancel_event = None
+        self.checkpoint = None
+        self.query_config = None
+        self.result = None
+        self.credentials = None
+        self.sheets_service = None
+        self.sheets_service_creds = None
+
         self.setup_query_frame()
+        self.run_in_background(default_schema.load, lambda schema: None, "Schema Error")
 
     def setup_query_frame(self):
         # Configuration Section
@@ -136,6 +2883,9 @@ class ForgeDataApp(tk.Tk):
         self.sheet_id = tk.StringVar()
         ttk.Entry(config_frame, textvariable=self.sheet_id, width=40).grid(row=1, column=1, sticky="ew", padx=5, pady=5)
 
+        self.sheets_incremental_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(config_frame, text="Append new rows only", variable=self.sheets_incremental_var).grid(row=1, column=2, sticky="w", padx=5, pady=5)
+
         # Query Section
         self.entity_var = tk.StringVar()
         entity_label = ttk.Label(self.query_frame, text="Select Entity:")
@@ -161,6 +2911,13 @@ class ForgeDataApp(tk.Tk):
         limit_entry = ttk.Entry(self.query_frame, textvariable=self.limit_var, width=10)
         limit_entry.grid(row=4, column=1, sticky="w", padx=5, pady=5)
 
+        # Swap and PoolDayData can be pulled as parallel time shards
+        shards_frame = ttk.Frame(self.query_frame)
+        shards_frame.grid(row=4, column=2, sticky="w", padx=5, pady=5)
+        self.shards_var = tk.StringVar(value="1")
+        ttk.Label(shards_frame, text="Parallel Shards:").grid(row=0, column=0, sticky="w")
+        ttk.Entry(shards_frame, textvariable=self.shards_var, width=5).grid(row=0, column=1, sticky="w", padx=5)
+
         # Button Section with even spacing
         button_frame = ttk.Frame(self.query_frame)
         button_frame.grid(row=5, column=0, columnspan=3, sticky="ew", padx=5, pady=5)
@@ -177,8 +2934,11 @@ class ForgeDataApp(tk.Tk):
         export_json_button = ttk.Button(button_frame, text="Export to JSON", command=self.export_to_json)
         export_json_button.grid(row=0, column=3, padx=5, pady=5)
 
-        query_button = ttk.Button(button_frame, text="Run Query", command=self.run_query)
-        query_button.grid(row=0, column=4, padx=5, pady=5)
+        self.query_button = ttk.Button(button_frame, text="Run Query", command=self.run_query)
+        self.query_button.grid(row=0, column=4, padx=5, pady=5)
+
+        self.cancel_button = ttk.Button(button_frame, text="Cancel", command=self.cancel_query, state='disabled')
+        self.cancel_button.grid(row=0, column=5, padx=5, pady=5)
 
         # Expand the buttons to take equal space
         button_frame.grid_columnconfigure(0, weight=1)
@@ -186,10 +2946,30 @@ class ForgeDataApp(tk.Tk):
         button_frame.grid_columnconfigure(2, weight=1)
         button_frame.grid_columnconfigure(3, weight=1)
         button_frame.grid_columnconfigure(4, weight=1)
-
-        self.result_text = scrolledtext.ScrolledText(self.query_frame, height=20)
-        self.result_text.grid(row=6, column=0, columnspan=3, sticky="nsew", padx=5, pady=5)
+        button_frame.grid_columnconfigure(5, weight=1)
+
+        # Results are shown in a virtualized grid; the raw JSON view is opt-in
+        self.results_frame = ttk.Frame(self.query_frame)
+        self.results_frame.grid(row=6, column=0, columnspan=3, sticky="nsew", padx=5, pady=5)
+        self.result_grid = ResultGrid(self.results_frame)
+        self.result_grid.pack(expand=True, fill='both')
+        self.result_text = scrolledtext.ScrolledText(self.results_frame, height=20)
         self.query_frame.grid_rowconfigure(6, weight=1)
+
+        status_frame = ttk.Frame(self.query_frame)
+        status_frame.grid(row=7, column=0, columnspan=3, sticky="ew", padx=5)
+        status_frame.grid_columnconfigure(0, weight=1)
+        self.progress_var = tk.StringVar()
+        ttk.Label(status_frame, textvariable=self.progress_var).grid(row=0, column=0, sticky="w")
+        self.table_var = tk.StringVar()
+        self.table_dropdown = ttk.Combobox(status_frame, textvariable=self.table_var, state='readonly', width=15)
+        self.table_dropdown.grid(row=0, column=1, sticky="e", padx=5)
+        self.table_dropdown.bind("<<ComboboxSelected>>", self.show_selected_table)
+        self.raw_json_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(status_frame, text="Show Raw JSON", variable=self.raw_json_var,
+                        command=self.toggle_raw_json).grid(row=0, column=2, sticky="e")
+        self.metrics_var = tk.StringVar()
+        ttk.Label(status_frame, textvariable=self.metrics_var, foreground='gray').grid(row=1, column=0, columnspan=3, sticky="w")
         self.query_frame.grid_columnconfigure(1, weight=1)
 
         # Add Export menu
@@ -200,77 +2980,94 @@ class ForgeDataApp(tk.Tk):
         self.file_menu.add_command(label="Export to CSV", command=self.export_to_csv)
         self.file_menu.add_command(label="Export to Excel", command=self.export_to_excel)
         self.file_menu.add_command(label="Export to JSON", command=self.export_to_json)
+        self.file_menu.add_command(label="Export to Parquet", command=lambda: self.export_to_arrow(".parquet"))
+        self.file_menu.add_command(label="Export to Arrow/Feather", command=lambda: self.export_to_arrow(".feather"))
+        self.file_menu.add_command(label="Stream Query to File...", command=self.stream_to_file)
+        self.file_menu.add_command(label="Resume Interrupted Pull...", command=self.resume_pull)
+        self.file_menu.add_command(label="Watch Query for Changes...", command=lambda: self.watch_query(False))
+        self.file_menu.add_command(label="Watch Query for Changes to File...", command=lambda: self.watch_query(True))
         self.file_menu.add_separator()
         self.file_menu.add_command(label="Save Query Configuration", command=self.save_query_config)
         self.file_menu.add_command(label="Load Query Configuration", command=self.load_query_config)
+        self.file_menu.add_command(label="Load Wallet List...", command=self.load_wallet_list)
+
+        self.use_cache_var = tk.BooleanVar(value=True)
+        self.refresh_cache_var = tk.BooleanVar(value=False)
+        self.cache_menu = tk.Menu(self.menu_bar, tearoff=0)
+        self.menu_bar.add_cascade(label="Cache", menu=self.cache_menu)
+        self.cache_menu.add_checkbutton(label="Use Response Cache", variable=self.use_cache_var)
+        self.cache_menu.add_checkbutton(label="Refresh Cached Responses", variable=self.refresh_cache_var)
+        self.stream_decode_var = tk.BooleanVar(value=False)
+        self.cache_menu.add_checkbutton(label="Stream-Decode Responses (Bypasses Cache)", variable=self.stream_decode_var)
+        self.cache_menu.add_separator()
+        self.cache_menu.add_command(label="Clear Response Cache", command=self.clear_cache)
+        self.cache_menu.add_command(label="Refresh Subgraph Schema", command=self.refresh_schema)
+
+        self.metrics_output_var = tk.StringVar(value='')
+        self.metrics_menu = tk.Menu(self.menu_bar, tearoff=0)
+        self.menu_bar.add_cascade(label="Metrics", menu=self.metrics_menu)
+        self.metrics_menu.add_radiobutton(label="Don't Record Metrics", variable=self.metrics_output_var, value='')
+        self.metrics_menu.add_radiobutton(label=f"Append to {METRICS_PATH}", variable=self.metrics_output_var, value=METRICS_PATH)
+        self.metrics_menu.add_radiobutton(label=f"Prometheus Textfile ({PROMETHEUS_PATH})", variable=self.metrics_output_var,
+                                          value=PROMETHEUS_PATH)
+
+        self.use_local_store_var = tk.BooleanVar(value=False)
+        self.store_menu = tk.Menu(self.menu_bar, tearoff=0)
+        self.menu_bar.add_cascade(label="Local Store", menu=self.store_menu)
+        self.store_menu.add_command(label="Sync Selected Entity", command=self.sync_local_store)
+        self.store_menu.add_checkbutton(label="Read From Local Store", variable=self.use_local_store_var)
+
+        self.analytics_menu = tk.Menu(self.menu_bar, tearoff=0)
+        self.menu_bar.add_cascade(label="Analytics", menu=self.analytics_menu)
+        self.enrich_var = tk.BooleanVar(value=False)
+        self.analytics_menu.add_checkbutton(label="Add Token Symbols and Decimals", variable=self.enrich_var)
+        self.analytics_menu.add_separator()
+        self.analytics_menu.add_command(label="Build Candles from Swaps...", command=self.build_swap_candles)
+        self.analytics_menu.add_command(label="Check Daily Candles Against PoolDayData", command=self.check_daily_candles)
 
 
     def export_to_csv(self):
-        data = self.get_query_results()
-        if data:
-            file_path = filedialog.asksaveasfilename(defaultextension=".csv")
-            if file_path:
-                with open(file_path, 'w', newline='') as csvfile:
-                    writer = csv.writer(csvfile)
-                    writer.writerows(data)
-                messagebox.showinfo("Export Successful", f"Data exported to {file_path}")
-                logging.info(f"Data exported to CSV: {file_path}")
+        self.export_file(".csv", "CSV")
 
     def export_to_excel(self):
-        data = self.get_query_results()
-        if data:
-            file_path = filedialog.asksaveasfilename(defaultextension=".xlsx")
-            if file_path:
-                df = pd.DataFrame(data[1:], columns=data[0])
-                df.to_excel(file_path, index=False)
-                messagebox.showinfo("Export Successful", f"Data exported to {file_path}")
-                logging.info(f"Data exported to Excel: {file_path}")
+        if not excel_available():
+            messagebox.showerror("Missing Dependency", "Excel exports need the xlsxwriter or openpyxl package (pip install xlsxwriter).")
+            return
+        self.export_file(".xlsx", "Excel")
 
     def export_to_json(self):
-        data = json.loads(self.result_text.get('1.0', tk.END))
-        if data:
-            file_path = filedialog.asksaveasfilename(defaultextension=".json")
+        self.export_file(".json", "JSON")
+
+    def export_to_arrow(self, extension):
+        if pa is None:
+            messagebox.showerror("Missing Dependency", "Parquet and Arrow exports need the pyarrow package (pip install pyarrow).")
+            return
+        self.export_file(extension, extension[1:].capitalize())
+
+    def export_file(self, extension, label):
+        if self.get_query_results():
+            file_path = filedialog.asksaveasfilename(defaultextension=extension)
             if file_path:
-                with open(file_path, 'w') as jsonfile:
-                    json.dump(data, jsonfile, indent=2)
+                started = time.perf_counter()
+                try:
+                    export_result(self.result, file_path)
+                except (ValueError, OSError) as e:
+                    logging.error(f"Export to {label} failed: {str(e)}")
+                    messagebox.showerror("Export Error", f"An error occurred while exporting: {str(e)}")
+                    return
+                default_metrics.add_time('export', time.perf_counter() - started)
+                self.metrics_var.set(default_metrics.summary())
                 messagebox.showinfo("Export Successful", f"Data exported to {file_path}")
-                logging.info(f"Data exported to JSON: {file_path}")
+                logging.info(f"Data exported to {label}: {file_path}")
 
     def get_query_results(self):
-        data = json.loads(self.result_text.get('1.0', tk.END))
-        if not data:
+        if self.result is None or not len(self.result):
             messagebox.showwarning("No Data", "Please run a query first.")
             return None
-
-        entity = self.entity_var.get()
-        if entity == "WalletOverview":
-            rows = []
-            if 'swaps' in data:
-                rows.append(["Swaps"])
-                rows.append(list(data['swaps'][0].keys()))
-                rows.extend([list(swap.values()) for swap in data['swaps']])
-                rows.append([])
-            if 'positions' in data:
-                rows.append(["Positions"])
-                rows.append(list(data['positions'][0].keys()))
-                rows.extend([list(position.values()) for position in data['positions']])
-        else:
-            key = entity.lower() + 's'
-            if key not in data:
-                messagebox.showwarning("No Data", "No data found for the selected entity.")
-                return None
-            rows = [list(data[key][0].keys())]
-            rows.extend([list(item.values()) for item in data[key]])
-        return rows
+        return self.result.sheet_rows()
 
     def save_query_config(self):
-        config = {
-            'entity': self.entity_var.get(),
-            'address': self.address_entry.get(),
-            'limit': self.limit_var.get(),
-            'fields': {field: getattr(self, f"{self.entity_var.get()}_{field}_var").get() 
-                       for field in SCHEMA[self.entity_var.get()]['fields']}
-        }
+        config = self.current_config()
         file_path = filedialog.asksaveasfilename(defaultextension=".json")
         if file_path:
             with open(file_path, 'w') as f:
@@ -287,6 +3084,8 @@ class ForgeDataApp(tk.Tk):
             self.address_entry.delete(0, tk.END)
             self.address_entry.insert(0, config['address'])
             self.limit_var.set(config['limit'])
+            self.shards_var.set(config.get('shards', '1'))
+            self.enrich_var.set(config.get('enrich', False))
             self.update_fields(None)  # Update fields for the loaded entity
             for field, value in config['fields'].items():
                 if hasattr(self, f"{config['entity']}_{field}_var"):
@@ -294,6 +3093,17 @@ class ForgeDataApp(tk.Tk):
             messagebox.showinfo("Load Successful", f"Query configuration loaded from {file_path}")
             logging.info(f"Query configuration loaded: {file_path}")
 
+    def load_wallet_list(self):
+        file_path = filedialog.askopenfilename(filetypes=[("Text files", "*.txt *.csv"), ("All files", "*.*")])
+        if file_path:
+            with open(file_path, 'r') as f:
+                wallets = parse_addresses(f.read())
+            self.entity_var.set("WalletOverview")
+            self.update_fields(None)
+            self.address_entry.delete(0, tk.END)
+            self.address_entry.insert(0, ", ".join(wallets))
+            logging.info(f"Loaded {len(wallets)} wallets from {file_path}")
+
     def show_field_description(self, event, description):
         x, y, _, _ = event.widget.bbox("insert")
         x += event.widget.winfo_rootx() + 25
@@ -314,55 +3124,6 @@ class ForgeDataApp(tk.Tk):
         if hasattr(self, 'tooltip'):
             self.tooltip.destroy()
 
-    def query_subgraph(self, query):
-        logging.info(f"Sending query: {query}")
-        try:
-            response = requests.post(URL, json={'query': query})
-            response.raise_for_status()
-            json_response = response.json()
-            
-            if 'errors' in json_response:
-                error_message = json_response['errors'][0]['message']
-                logging.error(f"Query error: {error_message}")
-                messagebox.showerror("Query Error", f"The subgraph returned an error: {error_message}")
-                return None
-            
-            if 'data' not in json_response:
-                logging.warning("Query returned no data")
-                messagebox.showwarning("No Data", "The query did not return any data. This could mean there's no matching data for your query.")
-                return None
-            
-            logging.info("Query successful")
-            return json_response['data']
-        except requests.RequestException as e:
-            logging.error(f"Request error: {str(e)}")
-            messagebox.showerror("Request Error", f"An error occurred while querying the subgraph: {str(e)}")
-            return None
-
-    def build_query(self, entity, fields, wallet_address=None):
-        limit = self.limit_var.get()
-        address = wallet_address or self.address_entry.get().strip()
-        
-        filter_condition = ''
-        if address:
-            if entity in ['Pool', 'Token']:
-                filter_condition = f'where: {{ id: "{address}" }}'
-            elif entity == 'Swap':
-                filter_condition = f'where: {{ origin: "{address}" }}'
-            elif entity == 'Position':
-                filter_condition = f'where: {{ owner: "{address}" }}'
-            elif entity == 'PoolDayData':
-                filter_condition = f'where: {{ pool: "{address}" }}'
-
-        query = f"""
-          query {{
-            {entity.lower()}s(first: {limit}, {filter_condition}) {{
-              {' '.join(fields)}
-            }}
-          }}
-        """
-        return query
-
     def browse_client_secret(self):
         filename = filedialog.askopenfilename(filetypes=[("JSON files", "*.json")])
         if filename:
@@ -439,112 +3200,417 @@ class ForgeDataApp(tk.Tk):
         if hasattr(self, 'tooltip'):
             self.tooltip.destroy()
     
-    def run_query(self):
+    def run_query(self, sink_path=None):
+        if self.query_thread is not None:
+            return
+
+        self.cancel_event = threading.Event()
+        config = self.current_config()
+        # Streamed pulls into a resumable format are checkpointed next to the file
+        checkpoint = None
+        if sink_path and getattr(SINKS.get(os.path.splitext(sink_path)[1].lower()), 'resumable', False):
+            checkpoint = Checkpoint(sink_path, config, self.stream_decode_var.get(),
+                                    use_local_store=self.use_local_store_var.get())
+        try:
+            jobs = config_jobs(config, self.cancel_event, self.use_local_store_var.get(),
+                               stream=self.stream_decode_var.get(), checkpoint=checkpoint)
+        except ValueError as e:
+            messagebox.showwarning("Invalid Query", str(e))
+            return
+        self.start_query(jobs, sink_path, checkpoint, config)
+
+    def resume_pull(self):
+        if self.query_thread is not None:
+            return
+        file_path = filedialog.askopenfilename(filetypes=[("Checkpoints", "*" + CHECKPOINT_SUFFIX)])
+        if not file_path:
+            return
+        try:
+            checkpoint = Checkpoint.load(file_path)
+        except (OSError, ValueError, KeyError) as e:
+            messagebox.showerror("Resume Error", f"Could not read the checkpoint: {str(e)}")
+            return
+
+        self.cancel_event = threading.Event()
+        try:
+            jobs = config_jobs(checkpoint.config, self.cancel_event, checkpoint.use_local_store,
+                               stream=checkpoint.stream, checkpoint=checkpoint)
+        except ValueError as e:
+            messagebox.showwarning("Invalid Query", str(e))
+            return
+        logging.info(f"Resuming {checkpoint.sink_path} after {checkpoint.rows()} rows")
+        self.start_query(jobs, checkpoint.sink_path, checkpoint, checkpoint.config)
+
+    def current_config(self):
         entity = self.entity_var.get()
-        if entity == "WalletOverview":
-            self.run_wallet_overview_query()
-        else:
-            selected_fields = [field for field, desc in SCHEMA[entity]['fields'].items() if getattr(self, f"{entity}_{field}_var").get()]
+        names = WALLET_FIELDS if entity == "WalletOverview" else SCHEMA.get(entity, {}).get('fields', {})
+        return {
+            'entity': entity,
+            'address': self.address_entry.get(),
+            'limit': self.limit_var.get(),
+            'shards': self.shards_var.get(),
+            'enrich': self.enrich_var.get(),
+            'fields': {name: getattr(self, f"{entity}_{name}_var").get()
+                       for name in names if hasattr(self, f"{entity}_{name}_var")}
+        }
 
-            if not selected_fields:
-                messagebox.showwarning("No Fields Selected", "Please select at least one field to query.")
-                return
+    def sync_local_store(self):
+        if self.query_thread is not None:
+            return
+
+        entity = self.entity_var.get()
+        if entity not in STORE_FIELDS:
+            messagebox.showwarning("Cannot Sync", f"Only {', '.join(STORE_FIELDS)} can be synced to the local store.")
+            return
 
-            query = self.build_query(entity, selected_fields)
-            data = self.query_subgraph(query)
-            if data is not None:
-                self.display_results(data)
+        self.cancel_event = threading.Event()
+        where = address_filter(entity, self.address_entry.get().strip())
+        self.start_query([(collection_name(entity), default_store.sync(entity, where, self.cancel_event))])
+
+    def start_query(self, jobs, sink_path=None, checkpoint=None, config=None):
+        # jobs is a list of (result key, page iterator) pairs consumed by the worker thread;
+        # config is the query configuration they came from, when there is one
+        entity = checkpoint.config.get('entity') if checkpoint is not None else self.entity_var.get()
+        sink = None
+        if sink_path:
+            try:
+                sink = open_sink(sink_path, sections=entity == "WalletOverview",
+                                 resume=checkpoint.sink_state if checkpoint is not None else None)
+                if checkpoint is not None and checkpoint.sink_state is None:
+                    checkpoint.save(sink)
+            except (ValueError, OSError, sqlite3.Error) as e:
+                messagebox.showerror("Export Error", str(e))
+                return
+        self.sink_path = sink_path
+        self.checkpoint = checkpoint
+        self.query_config = config
+        default_cache.enabled = self.use_cache_var.get()
+        default_cache.refresh = self.refresh_cache_var.get()
+        self.cache_stats = default_cache.stats()
+        default_metrics.reset(entity)
+        self.result_queue = queue.Queue()
+        self.rows_fetched = checkpoint.rows() if checkpoint is not None else 0
+        self.query_started = time.monotonic()
+        self.query_button.config(state='disabled')
+        self.cancel_button.config(state='normal')
+        self.progress_var.set("Querying...")
+        self.result = QueryResult(entity)
+        self.stream_json = self.raw_json_var.get()
+        if self.stream_json:
+            self.begin_results()
+        self.result_grid.set_table(None)
+        self.table_dropdown.config(values=[])
+        self.table_var.set('')
+        self.query_thread = threading.Thread(target=query_worker, daemon=True,
+                                             args=(jobs, self.result, self.result_queue, self.cancel_event, sink, checkpoint))
+        self.query_thread.start()
+        self.after(QUEUE_POLL_MS, self.poll_query)
+
+    def clear_cache(self):
+        default_cache.clear()
+        messagebox.showinfo("Cache Cleared", "All cached subgraph responses were removed.")
+        logging.info("Response cache cleared")
+
+    def refresh_schema(self):
+        def done(schema):
+            if schema.entities is None:
+                messagebox.showwarning("Schema Not Loaded", "The subgraph schema could not be introspected; see the log for details.")
             else:
-                messagebox.showerror("Query Error", "Failed to retrieve data. Please check your query and try again.")
-
-    def run_wallet_overview_query(self):
-        wallet_address = self.address_entry.get().strip()
-        if not wallet_address:
-            messagebox.showwarning("No Wallet Address", "Please enter a wallet address.")
-            return
-
-        queries = []
-        if getattr(self, "WalletOverview_Swap_var").get():
-            swap_fields = ['id', 'timestamp', 'pool', 'token0', 'token1', 'amount0', 'amount1', 'amountUSD']
-            queries.append(self.build_query("Swap", swap_fields, wallet_address))
-        if getattr(self, "WalletOverview_Position_var").get():
-            position_fields = ['id', 'owner', 'pool', 'token0', 'token1', 'liquidity', 'depositedToken0', 'depositedToken1', 'withdrawnToken0', 'withdrawnToken1', 'collectedFeesToken0', 'collectedFeesToken1']
-            queries.append(self.build_query("Position", position_fields, wallet_address))
-
-        combined_query = "query {" + " ".join(queries) + "}"
-        data = self.query_subgraph(combined_query)
-        if data is not None:
-            self.display_results(data)
-            self.entity_var.set("WalletOverview")  # Set the entity to WalletOverview
-
-    def build_query(self, entity, fields, wallet_address=None):
-        limit = self.limit_var.get()
-        address = wallet_address or self.address_entry.get().strip()
-        
-        filter_condition = ''
-        if address:
-            if entity in ['Pool', 'Token']:
-                filter_condition = f'where: {{ id: "{address}" }}'
-            elif entity == 'Swap':
-                filter_condition = f'where: {{ origin: "{address}" }}'
-            elif entity == 'Position':
-                filter_condition = f'where: {{ owner: "{address}" }}'
-
-        query = f"""
-          {entity.lower()}s(first: {limit}, {filter_condition}) {{
-            {' '.join(fields)}
-          }}
-        """
-        return query
+                messagebox.showinfo("Schema Refreshed", f"Loaded {len(schema.entities)} entities from the subgraph schema.")
 
-    def display_results(self, data):
+        self.progress_var.set("Introspecting the subgraph schema...")
+        self.run_in_background(lambda: default_schema.load(refresh=True), done, "Schema Error")
+
+    def stream_to_file(self):
+        if self.query_thread is not None:
+            return
+        file_path = filedialog.asksaveasfilename(defaultextension=".csv",
+                                                 filetypes=[("CSV files", "*.csv"), ("JSON Lines files", "*.jsonl"),
+                                                            ("Parquet files", "*.parquet"), ("Arrow/Feather files", "*.arrow *.feather"),
+                                                            ("SQLite databases", "*.sqlite *.db"), ("Excel files", "*.xlsx")])
+        if file_path:
+            self.run_query(file_path)
+
+    def watch_query(self, to_file):
+        if self.query_thread is not None:
+            return
+        interval = simpledialog.askinteger("Watch Query", "Seconds between polls:", initialvalue=WATCH_INTERVAL,
+                                           minvalue=1, parent=self)
+        if not interval:
+            return
+        sink_path = None
+        if to_file:
+            sink_path = filedialog.asksaveasfilename(defaultextension=".jsonl",
+                                                     filetypes=[("JSON Lines files", "*.jsonl"), ("SQLite databases", "*.sqlite *.db")])
+            if not sink_path:
+                return
+        config = self.current_config()
+        self.cancel_event = threading.Event()
+        try:
+            # Checked once up front so a bad configuration is reported here rather than by the worker
+            config_jobs(config)
+        except ValueError as e:
+            messagebox.showwarning("Invalid Query", str(e))
+            return
+        self.start_query(watch(config, interval, self.cancel_event), sink_path)
+        logging.info(f"Watching {config['entity']} every {interval}s")
+
+    def cancel_query(self):
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+            self.progress_var.set(f"Cancelling after {self.rows_fetched} rows...")
+
+    def poll_query(self):
+        finished = None
+        try:
+            while True:
+                message = self.result_queue.get_nowait()
+                if message[0] == 'rows':
+                    _, key, rows = message
+                    if self.stream_json:
+                        self.append_results(key, rows)
+                    self.rows_fetched += len(rows)
+                elif message[0] == 'written':
+                    self.rows_fetched += message[2]
+                else:
+                    finished = message
+                    break
+        except queue.Empty:
+            pass
+        self.refresh_result_grid()
+        self.metrics_var.set(default_metrics.summary())
+
+        elapsed = max(time.monotonic() - self.query_started, 1e-6)
+        progress = f"{self.rows_fetched} rows fetched ({self.rows_fetched / elapsed:.0f} rows/s)"
+        if finished is None:
+            self.progress_var.set(progress)
+            self.after(QUEUE_POLL_MS, self.poll_query)
+            return
+
+        if self.stream_json:
+            self.end_results()
+        elif self.raw_json_var.get():
+            self.display_results(self.result.to_json())
+        self.query_thread = None
+        self.query_button.config(state='normal')
+        self.cancel_button.config(state='disabled')
+        status = 'failed' if finished[0] == 'error' else ('cancelled' if self.cancel_event.is_set() else 'done')
+        self.record_metrics(status)
+        # Interrupted checkpointed pulls can be picked up again from the File menu
+        resumable = " (File > Resume Interrupted Pull to continue)" if self.checkpoint is not None else ""
+        if finished[0] == 'error':
+            _, title, error_message = finished
+            self.progress_var.set(f"Failed after {self.rows_fetched} rows{resumable}")
+            messagebox.showerror(title, error_message)
+        elif self.cancel_event.is_set():
+            self.progress_var.set(f"Cancelled: {progress}{resumable}")
+            logging.info(f"Query cancelled after {self.rows_fetched} rows")
+        else:
+            stats = default_cache.stats()
+            hits = stats['hits'] - self.cache_stats['hits']
+            misses = stats['misses'] - self.cache_stats['misses']
+            self.progress_var.set(f"Done: {progress} in {elapsed:.1f}s, cache {hits} hits / {misses} misses")
+            logging.info(f"Query finished: {self.rows_fetched} rows in {elapsed:.1f}s")
+            if self.sink_path:
+                messagebox.showinfo("Export Successful", f"{self.rows_fetched} rows streamed to {self.sink_path}")
+                logging.info(f"Data streamed to {self.sink_path}")
+
+    def record_metrics(self, status):
+        record = default_metrics.snapshot(status)
+        logging.info(f"Query metrics: {json.dumps(record)}")
+        if self.metrics_output_var.get():
+            try:
+                write_metrics(record, self.metrics_output_var.get())
+            except OSError as e:
+                logging.error(f"Could not write metrics: {str(e)}")
+
+    def swaps_frame(self):
+        table = self.result.tables.get('swaps') if self.result is not None else None
+        if self.query_thread is not None or table is None or not len(table):
+            messagebox.showwarning("No Swaps", "Please run a Swap query (with timestamp, amount0 and amount1) first.")
+            return None
+        return table.to_dataframe()
+
+    def build_swap_candles(self):
+        swaps = self.swaps_frame()
+        if swaps is None:
+            return
+        interval = simpledialog.askstring("Build Candles", "Candle interval (e.g. 1m, 5m, 1h, 1d):",
+                                          initialvalue="1h", parent=self)
+        if not interval:
+            return
+
+        def done(candles):
+            # The candles replace the swaps as the current result, so every export path applies
+            self.result = candles_result(candles)
+            self.table_var.set('')
+            self.refresh_result_grid()
+            self.progress_var.set(f"Built {len(candles)} {interval} candles from {len(swaps)} swaps")
+            logging.info(f"Built {len(candles)} {interval} candles from {len(swaps)} swaps")
+
+        self.progress_var.set("Building candles...")
+        self.run_in_background(lambda: build_candles(swaps, interval), done, "Candle Error")
+
+    def check_daily_candles(self):
+        swaps = self.swaps_frame()
+        if swaps is None:
+            return
+        # A wallet-filtered or limited pull misses most of each day's swaps
+        config = self.query_config or {}
+        if (config.get('entity') != "Swap" or (config.get('address') or '').strip()
+                or str(config.get('limit') or '').strip()):
+            messagebox.showwarning("Incomplete Swaps",
+                                   "Daily candles can only be checked against PoolDayData when they are built from "
+                                   "every swap of each day. Run the Swap query again with no address and an empty "
+                                   "Limit (Parallel Shards speeds this up).")
+            return
+
+        def check():
+            candles = build_candles(swaps, '1d')
+            if 'pool' not in swaps.columns or candles.empty:
+                raise ValueError("The swaps need a pool column to compare with PoolDayData.")
+            days = fetch_pool_day_datas(candles['pool'].unique(), candles['timestamp'].min(),
+                                        candles['timestamp'].max() + 86400)
+            return compare_daily_candles(candles, days)
+
+        def done(checks):
+            matched = int(checks['matches'].sum())
+            messagebox.showinfo("Daily Candle Check",
+                                f"{matched} of {len(checks)} pool-days match PoolDayData close/high/low "
+                                f"within {CANDLE_TOLERANCE:.0%}.")
+            logging.info(f"Daily candle check: {matched} of {len(checks)} pool-days match")
+
+        self.progress_var.set("Checking daily candles...")
+        self.run_in_background(check, done, "Candle Check Error")
+
+    def refresh_result_grid(self):
+        keys = list(self.result.tables)
+        if list(self.table_dropdown.cget('values')) != keys:
+            self.table_dropdown.config(values=keys)
+        if keys and self.table_var.get() not in keys:
+            self.table_var.set(keys[0])
+            self.result_grid.set_table(self.result.tables[keys[0]])
+        else:
+            self.result_grid.refresh()
+
+    def show_selected_table(self, event):
+        if self.result is not None and self.table_var.get() in self.result.tables:
+            self.result_grid.set_table(self.result.tables[self.table_var.get()])
+
+    def toggle_raw_json(self):
+        if self.raw_json_var.get():
+            self.result_grid.pack_forget()
+            self.result_text.pack(expand=True, fill='both')
+            if self.result is not None and self.query_thread is None:
+                self.display_results(self.result.to_json())
+        else:
+            self.result_text.pack_forget()
+            self.result_text.delete('1.0', tk.END)
+            self.result_grid.pack(expand=True, fill='both')
+
+    # With the raw JSON view on, results are streamed into the text widget as valid JSON,
+    # one section per result key
+    def begin_results(self):
         self.result_text.delete('1.0', tk.END)
-        self.result_text.insert(tk.END, json.dumps(data, indent=2))
+        self.result_text.insert(tk.END, "{")
+        self.result_key = None
+
+    def append_results(self, key, rows):
+        chunks = []
+        if key != self.result_key:
+            if self.result_key is not None:
+                chunks.append("\n  ],")
+            chunks.append(f"\n  {json.dumps(key)}: [")
+            self.result_key = key
+            self.result_first_row = True
+        for row in rows:
+            chunks.append(("\n" if self.result_first_row else ",\n") + textwrap.indent(json.dumps(row, indent=2), '    '))
+            self.result_first_row = False
+        self.result_text.insert(tk.END, ''.join(chunks))
+
+    def end_results(self):
+        self.result_text.insert(tk.END, "\n  ]\n}" if self.result_key is not None else "}")
+
+    def display_results(self, data):
+        self.begin_results()
+        for key, rows in data.items():
+            self.append_results(key, rows)
+        self.end_results()
 
     def export_to_sheets(self):
         if not self.client_secret_path.get() or not self.sheet_id.get():
             messagebox.showwarning("Missing Information", "Please provide both the client secret path and Google Sheet ID.")
             return
 
-        creds = self.get_credentials()
-        service = build('sheets', 'v4', credentials=creds)
+        rows = self.get_query_results()
+        if rows is None:
+            return
 
         sheet_id = self.sheet_id.get()
         entity = self.entity_var.get()
-        
-        data = json.loads(self.result_text.get('1.0', tk.END))
-        if not data:
-            messagebox.showwarning("No Data", "Please run a query first.")
+        sections = entity == "WalletOverview"
+        incremental = self.sheets_incremental_var.get() and not sections
+        if incremental and not all('id' in table.columns for table in self.result.tables.values()):
+            messagebox.showwarning("Missing id", "Append new rows only matches rows by id; "
+                                                 "select the id field or turn it off.")
             return
-
-        if entity == "WalletOverview":
-            # Handle WalletOverview separately
-            rows = []
-            if 'swaps' in data:
-                rows.append(["Swaps"])
-                rows.append(list(data['swaps'][0].keys()))  # Headers
-                for swap in data['swaps']:
-                    rows.append(list(swap.values()))
-                rows.append([])  # Empty row for separation
-            if 'positions' in data:
-                rows.append(["Positions"])
-                rows.append(list(data['positions'][0].keys()))  # Headers
-                for position in data['positions']:
-                    rows.append(list(position.values()))
-        else:
-            # Handle other entities
-            if entity.lower() + 's' not in data:
-                messagebox.showwarning("No Data", "Please run a query first.")
+        service = self.get_sheets_service()
+
+        def upload():
+            started = time.perf_counter()
+            sink = SheetsSink(service, self.credentials, sheet_id, entity, incremental, sections)
+            try:
+                sink.write_values(rows)
+            finally:
+                sink.close()
+                default_metrics.add_time('export', time.perf_counter() - started)
+            return sink.rows_written
+
+        def done(rows_written):
+            self.metrics_var.set(default_metrics.summary())
+            messagebox.showinfo("Export Successful", f"{rows_written} rows written to Google Sheets.")
+            logging.info(f"Data exported to Google Sheets: {sheet_id} ({rows_written} rows)")
+
+        self.progress_var.set("Uploading to Google Sheets...")
+        self.run_in_background(upload, done, "Google Sheets Error")
+
+    def run_in_background(self, task, on_done, error_title):
+        # Runs task() off the Tk thread and hands its result to on_done() on the Tk thread
+        results = queue.Queue()
+
+        def work():
+            try:
+                results.put(('done', task()))
+            except Exception as e:
+                logging.error(f"{error_title}: {str(e)}")
+                results.put(('error', e))
+
+        def poll():
+            try:
+                status, value = results.get_nowait()
+            except queue.Empty:
+                self.after(QUEUE_POLL_MS, poll)
                 return
-            rows = [list(data[entity.lower() + 's'][0].keys())]  # Headers
-            for item in data[entity.lower() + 's']:
-                rows.append(list(item.values()))
+            self.progress_var.set("")
+            if status == 'error':
+                messagebox.showerror(error_title, str(value))
+            else:
+                on_done(value)
 
-        self.update_sheet(service, sheet_id, entity, rows)
+        threading.Thread(target=work, daemon=True).start()
+        self.after(QUEUE_POLL_MS, poll)
+
+    def get_sheets_service(self):
+        # The authorized client is built once and reused; credentials refresh themselves
+        creds = self.get_credentials()
+        if self.sheets_service is None or self.sheets_service_creds is not creds:
+            self.sheets_service = build('sheets', 'v4', credentials=creds)
+            self.sheets_service_creds = creds
+        return self.sheets_service
 
     def get_credentials(self):
-        creds = None
-        if os.path.exists('token.json'):
+        creds = self.credentials
+        if creds is None and os.path.exists('token.json'):
             creds = Credentials.from_authorized_user_file('token.json', SCOPES)
         
         if not creds or not creds.valid:
@@ -557,23 +3623,41 @@ class ForgeDataApp(tk.Tk):
             with open('token.json', 'w') as token:
                 token.write(creds.to_json())
         
+        self.credentials = creds
         return creds
 
-    def update_sheet(self, service, spreadsheet_id, sheet_name, data):
-        try:
-            service.spreadsheets().get(spreadsheetId=spreadsheet_id, ranges=sheet_name).execute()
-        except:
-            request = {'addSheet': {'properties': {'title': sheet_name}}}
-            service.spreadsheets().batchUpdate(spreadsheetId=spreadsheet_id, body={'requests': [request]}).execute()
-
-        range_name = f"{sheet_name}!A1"
-        body = {'values': data}
-        result = service.spreadsheets().values().update(
-            spreadsheetId=spreadsheet_id, range=range_name,
-            valueInputOption='USER_ENTERED', body=body).execute()
-        
-        messagebox.showinfo("Export Successful", f"{result.get('updatedCells')} cells updated in Google Sheets.")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Forge Data Scraper. Starts the GUI unless a command is given.")
+    commands = parser.add_subparsers(dest='command')
+    run = commands.add_parser('run', help="Run saved query configurations without the GUI")
+    run.add_argument('configs', nargs='+', help="Configuration files written by Save Query Configuration")
+    run.add_argument('--out', default='.', help="Directory to write the exports to (default: current directory)")
+    run.add_argument('--format', default='csv', choices=sorted({ext[1:] for ext in list(SINKS) + list(EXPORTERS)}),
+                     help="Export format (default: csv)")
+    run.add_argument('--workers', type=int, default=4, help="Configurations to run at the same time (default: 4)")
+    run.add_argument('--stream', action='store_true',
+                     help="Decode responses row by row as they arrive (less memory, bypasses the response cache)")
+    run.add_argument('--resume', action='store_true',
+                     help="Continue interrupted csv, jsonl or sqlite exports from their checkpoint instead of starting over")
+    run.add_argument('--metrics', metavar='PATH',
+                     help="Record run metrics to PATH: JSON lines, or a Prometheus textfile if PATH ends in .prom")
+    watch_command = commands.add_parser('watch', help="Re-run a saved query configuration and record only changed rows")
+    watch_command.add_argument('config', help="Configuration file written by Save Query Configuration")
+    watch_command.add_argument('--out', required=True, help=f"File to write the changes to ({', '.join(SINKS)})")
+    watch_command.add_argument('--interval', type=float, default=WATCH_INTERVAL,
+                               help=f"Seconds between polls (default: {WATCH_INTERVAL})")
+    args = parser.parse_args(argv)
+
+    if args.command == 'watch':
+        return run_watch(args.config, args.out, max(1.0, args.interval))
+    if args.command == 'run':
+        failures = run_batch(args.configs, args.out, '.' + args.format, max(1, args.workers), args.metrics, args.stream,
+                             args.resume)
+        return 1 if failures else 0
 
-if __name__ == "__main__":
     app = ForgeDataApp()
     app.mainloop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
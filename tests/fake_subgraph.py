@@ -0,0 +1,28 @@
+import re
+import threading
+
+import benchmark
+
+# Answers the queries paginate/backfill send from rows kept in cursor order, without
+# HTTP, and records the `first` and where filter of every request
+class FakeSubgraph:
+    def __init__(self, **collections):
+        self.collections = collections
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def __call__(self, query):
+        data = {}
+        for alias, collection, arguments, selection in benchmark.COLLECTION_PATTERN.findall(query):
+            first = int(re.search(r'first:\s*(\d+)', arguments).group(1))
+            where = re.search(r'where:\s*\{(.*)\}', arguments)
+            filters = benchmark.parse_filters(where.group(1)) if where else []
+            with self.lock:
+                self.requests.append((first, {f'{field}_{op}': value for field, op, value in filters}))
+            fields = [field for field, _ in benchmark.SELECTION_PATTERN.findall(selection)]
+            rows = self.collections[collection]
+            if re.search(r'orderDirection:\s*desc', arguments):
+                rows = rows[::-1]
+            rows = [row for row in rows if benchmark.row_matches(row, filters)][:first]
+            data[alias or collection] = [{field: row[field] for field in fields} for row in rows]
+        return data
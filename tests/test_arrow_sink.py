@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import forge_scraper as fs
+
+pa = pytest.importorskip('pyarrow')
+pq = pytest.importorskip('pyarrow.parquet')
+
+def pages(count, size):
+    for start in range(0, count, size):
+        yield [{'id': f'0x{i:04x}', 'timestamp': str(i), 'pool': f'0xpool{i % 7}',
+                'amountUSD': str(i / 8), 'liquidity': str(2 ** 120 + i), 'totalSupply': str(2 ** 255 + i)}
+               for i in range(start, min(start + size, count))]
+
+@pytest.mark.parametrize('extension', ['.feather', '.arrow', '.parquet'])
+def test_streams_several_row_groups(tmp_path, monkeypatch, extension):
+    monkeypatch.setattr(fs, 'ROW_GROUP_SIZE', 25)
+    path = str(tmp_path / f'swaps{extension}')
+    sink = fs.ArrowSink(path)
+    for page in pages(110, 10):
+        sink.write('swaps', page)
+    sink.close()
+    if extension == '.parquet':
+        data = pq.read_table(path)
+    else:
+        with pa.ipc.open_file(path) as reader:
+            assert reader.num_record_batches > 1
+            data = reader.read_all()
+    assert data.num_rows == 110
+    assert data.column('id').to_pylist() == [f'0x{i:04x}' for i in range(110)]
+    assert data.column('pool').to_pylist()[:4] == ['0xpool0', '0xpool1', '0xpool2', '0xpool3']
+    assert data.column('amountUSD').to_pylist()[9] == 9 / 8
+    assert int(data.column('liquidity').to_pylist()[5]) == 2 ** 120 + 5
+    # uint256 values overflow decimal256, so they are written as text
+    assert data.column('totalSupply').to_pylist()[7] == str(2 ** 255 + 7)
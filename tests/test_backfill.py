@@ -0,0 +1,48 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import forge_scraper as fs
+from fake_subgraph import FakeSubgraph
+
+# 2500 swaps over timestamps 1000-1499, five per second, so window edges fall inside runs
+SWAPS = [{'id': f'0x{i:04x}', 'timestamp': str(1000 + i // 5)} for i in range(2500)]
+
+def ids(pages):
+    return [row['id'] for page in pages for row in page]
+
+@pytest.mark.parametrize('shards', [1, 2, 3, 7])
+def test_time_windows_cover_the_range(shards):
+    windows = fs.time_windows(1000, 1500, shards)
+    assert len(windows) == shards
+    assert windows[0][0] == 1000 and windows[-1][1] == 1500
+    assert all(upper == lower for (_, upper), (lower, _) in zip(windows, windows[1:]))
+
+@pytest.mark.parametrize('shards', [1, 2, 4, 7])
+def test_rows_come_in_time_order_without_overlap(shards):
+    fetch = FakeSubgraph(swaps=SWAPS)
+    pages = fs.backfill("Swap", ['id', 'timestamp'], shards=shards, workers=shards, fetch=fetch)
+    assert ids(pages) == [row['id'] for row in SWAPS]
+    windows = [(where['timestamp_gte'], where['timestamp_lt']) for _, where in fetch.requests
+               if 'timestamp_lt' in where and 'id_not_in' not in where]
+    assert sorted(windows) == [(str(lower), str(upper)) for lower, upper in fs.time_windows(1000, 1500, shards)]
+
+def test_explicit_range():
+    pages = fs.backfill("Swap", ['id'], start=1100, end=1200, shards=3, fetch=FakeSubgraph(swaps=SWAPS))
+    assert ids(pages) == [row['id'] for row in SWAPS[500:1000]]
+
+@pytest.mark.parametrize('limit', [1, 625, 700, 1800, 2500, 4000])
+def test_limit(limit):
+    pages = list(fs.backfill("Swap", ['id'], limit=limit, shards=4, fetch=FakeSubgraph(swaps=SWAPS)))
+    assert ids(pages) == [row['id'] for row in SWAPS[:limit]]
+
+def test_later_windows_stop_at_the_limit():
+    # One worker runs the windows in order, so what each one asks for is predictable
+    fetch = FakeSubgraph(swaps=SWAPS)
+    pages = fs.backfill("Swap", ['id'], start=1000, end=1500, limit=700, shards=4, workers=1, fetch=fetch)
+    assert len(ids(pages)) == 700
+    # 625 rows in the first window leave 75 for the second, and none for the last two
+    assert [first for first, _ in fetch.requests] == [700, 75]
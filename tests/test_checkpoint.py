@@ -0,0 +1,99 @@
+import csv
+import json
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import benchmark
+import forge_scraper as fs
+
+ROWS = 5000
+LIMIT = 4200
+
+@pytest.fixture(scope='module')
+def subgraph():
+    mock = benchmark.MockSubgraph(ROWS)
+    yield mock
+    mock.close()
+
+@pytest.fixture
+def requests_until(subgraph, monkeypatch):
+    # Points the default transport at the mock; the returned function makes every
+    # request from the n-th one on fail, or none with None
+    monkeypatch.setattr(fs, 'default_transport', fs.SubgraphTransport(subgraph.url, limiter=False))
+    monkeypatch.setattr(fs.default_cache, 'enabled', False)
+    real = fs.SubgraphTransport.request
+    calls = {'count': 0, 'fail': None}
+
+    def request(self, *args, **kwargs):
+        calls['count'] += 1
+        if calls['fail'] is not None and calls['count'] >= calls['fail']:
+            raise fs.SubgraphError("connection dropped")
+        return real(self, *args, **kwargs)
+
+    monkeypatch.setattr(fs.SubgraphTransport, 'request', request)
+
+    def fail_from(n):
+        calls.update(count=0, fail=n)
+    return fail_from
+
+def ids(path):
+    if path.endswith('.csv'):
+        with open(path, newline='') as f:
+            return [row[0] for row in list(csv.reader(f))[1:]]
+    if path.endswith('.jsonl'):
+        with open(path) as f:
+            return [json.loads(line)['id'] for line in f]
+    db = sqlite3.connect(path)
+    try:
+        return [row[0] for row in db.execute('SELECT id FROM swaps ORDER BY rowid')]
+    finally:
+        db.close()
+
+def add_junk(path):
+    # What a crash can leave behind a saved checkpoint: part of a page the checkpoint never recorded
+    if path.endswith('.sqlite'):
+        db = sqlite3.connect(path)
+        db.execute('INSERT INTO swaps (id) VALUES (?)', ('0xjunk',))
+        db.commit()
+        db.close()
+    else:
+        with open(path, 'a') as f:
+            f.write('0xjunk,16000' if path.endswith('.csv') else '{"id": "0xjunk", "timest')
+
+@pytest.mark.parametrize('stream', [False, True])
+@pytest.mark.parametrize('extension', ['.csv', '.jsonl', '.sqlite'])
+def test_resume_after_interruption(tmp_path, requests_until, extension, stream):
+    config_path = tmp_path / 'swaps.json'
+    config_path.write_text(json.dumps({'entity': 'Swap', 'limit': str(LIMIT),
+                                       'fields': {'id': True, 'timestamp': True, 'amountUSD': True}}))
+    out_path = str(tmp_path / ('swaps' + extension))
+
+    requests_until(3)
+    with pytest.raises(fs.SubgraphError):
+        fs.run_config(str(config_path), str(tmp_path), extension, stream=stream)
+    checkpoint = fs.Checkpoint.load(fs.checkpoint_path(out_path))
+    assert checkpoint.rows() == 2 * fs.PAGE_SIZE
+    assert ids(out_path) == [benchmark.swap_row(i)['id'] for i in range(checkpoint.rows())]
+    add_junk(out_path)
+
+    requests_until(None)
+    _, rows = fs.run_config(str(config_path), str(tmp_path), extension, stream=stream, resume=True)
+    assert rows == LIMIT - 2 * fs.PAGE_SIZE
+    assert ids(out_path) == [benchmark.swap_row(i)['id'] for i in range(LIMIT)]
+    assert not os.path.exists(fs.checkpoint_path(out_path))
+
+def test_checkpoint_keeps_local_store_choice(tmp_path):
+    path = str(tmp_path / 'swaps.csv')
+    checkpoint = fs.Checkpoint(path, {'entity': 'Swap'}, use_local_store=True)
+    checkpoint.save(fs.open_sink(path))
+    assert fs.Checkpoint.load(checkpoint.path).use_local_store
+    # Checkpoints written before the setting was saved read as pulls from the subgraph
+    with open(checkpoint.path) as f:
+        data = json.load(f)
+    del data['use_local_store']
+    assert not fs.Checkpoint(path, None, data=data).use_local_store
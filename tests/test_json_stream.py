@@ -0,0 +1,88 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import forge_scraper as fs
+
+ROWS = [
+    {'id': '0x01', 'timestamp': 1600000000, 'amount0': '-1234567.123456789012345678', 'price': 1.5e-7,
+     'pool': {'id': '0xab'}, 'note': 'café "quoted" \\ slash'},
+    {'id': '0x02', 'timestamp': 1600000123, 'amount0': '42', 'price': -12345.678, 'pool': None, 'note': ''},
+    {'id': '0x03', 'timestamp': 7, 'amount0': '0', 'price': 0, 'pool': {'id': '0xcd'}, 'note': 'true'},
+]
+
+def body(payload):
+    return json.dumps(payload, ensure_ascii=False).encode()
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+def rows(chunks, key='swaps'):
+    return list(fs.stream_rows(fs.JsonStream(chunks), key))
+
+def test_whole_body():
+    data = body({'data': {'swaps': ROWS}})
+    assert rows([data]) == ROWS
+
+@pytest.mark.parametrize('size', [1, 2, 3, 5, 7, 11, 64])
+def test_every_chunk_split(size):
+    # Small chunks cut through strings, escapes, multi-byte characters and numbers
+    data = body({'data': {'swaps': ROWS}})
+    assert rows(chunked(data, size)) == ROWS
+
+@pytest.mark.parametrize('number', ['12345', '-12345', '1.5', '1.25e-7', '3E+10', '0'])
+def test_numbers_split_at_every_position(number):
+    data = ('{"data": {"swaps": [{"value": ' + number + '}]}}').encode()
+    start = data.index(number.encode())
+    for cut in range(start + 1, start + len(number)):
+        assert rows([data[:cut], data[cut:]]) == [{'value': json.loads(number)}]
+
+def test_other_collections_and_fields_are_skipped():
+    data = body({'extensions': {'x': [1, 2]}, 'data': {'pools': [{'id': 'p'}], 'swaps': ROWS[:1], 'meta': None}})
+    assert rows(chunked(data, 4)) == ROWS[:1]
+
+def test_empty_collection():
+    assert rows([b'{"data": {"swaps": []}}']) == []
+
+def test_errors_payload():
+    data = body({'errors': [{'message': 'Query is too complex'}]})
+    with pytest.raises(fs.SubgraphError, match='too complex'):
+        rows(chunked(data, 3))
+
+def test_errors_after_data():
+    data = body({'data': {'swaps': ROWS[:1]}, 'errors': [{'message': 'indexing error'}]})
+    stream = fs.stream_rows(fs.JsonStream([data]), 'swaps')
+    assert next(stream) == ROWS[0]
+    with pytest.raises(fs.SubgraphError, match='indexing error'):
+        list(stream)
+
+@pytest.mark.parametrize('cut', [1, 10, 25, -40, -3, -1])
+def test_truncated_body(cut):
+    data = body({'data': {'swaps': ROWS}})
+    with pytest.raises(fs.SubgraphError):
+        rows(chunked(data[:cut], 8))
+
+def test_not_json():
+    with pytest.raises(fs.SubgraphError):
+        rows([b'<html><body>502 Bad Gateway</body></html>'])
+
+def test_invalid_utf8():
+    with pytest.raises(fs.SubgraphError):
+        rows([b'{"data": {"swaps": [{"id": "\xff\xfe"}]}}'])
+
+class Response:
+    def __init__(self, content):
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content)
+
+def test_decode_rejects_non_json():
+    transport = fs.SubgraphTransport('http://localhost', limiter=False)
+    with pytest.raises(fs.SubgraphError, match='not JSON'):
+        transport.decode(Response(b'<html>Bad Gateway</html>'))
+    assert transport.decode(Response(b'{"data": {}}')) == {'data': {}}
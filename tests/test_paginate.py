@@ -0,0 +1,75 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import forge_scraper as fs
+from fake_subgraph import FakeSubgraph
+
+# Timestamps repeat in long runs, so most page boundaries fall inside a run
+SWAPS = [{'id': f'0x{i:02x}', 'timestamp': str(100 + i // 5), 'amountUSD': str(i)} for i in range(23)]
+POOLS = [{'id': f'0x{i:02x}', 'feeTier': '500'} for i in range(11)]
+
+def ids(pages):
+    return [row['id'] for page in pages for row in page]
+
+def test_advance_cursor_on_timestamps():
+    rows = [{'id': 'a', 'timestamp': 1}, {'id': 'b', 'timestamp': 2}, {'id': 'c', 'timestamp': 2}]
+    cursor = fs.advance_cursor(None, rows, 'timestamp')
+    assert cursor == (2, ['b', 'c'])
+    # A page wholly inside the same timestamp adds to the ids already seen there
+    assert fs.advance_cursor(cursor, [{'id': 'd', 'timestamp': 2}], 'timestamp') == (2, ['b', 'c', 'd'])
+    assert fs.advance_cursor(cursor, [{'id': 'e', 'timestamp': 3}], 'timestamp') == (3, ['e'])
+
+def test_advance_cursor_on_ids():
+    assert fs.advance_cursor(('a', []), [{'id': 'b'}, {'id': 'c'}], 'id') == ('c', [])
+
+@pytest.mark.parametrize('page_size', [1, 2, 3, 4, 5, 7, 23, 100])
+def test_shared_timestamps_across_pages(page_size):
+    fetch = FakeSubgraph(swaps=SWAPS)
+    pages = list(fs.paginate("Swap", ['id', 'timestamp', 'amountUSD'], page_size=page_size, fetch=fetch))
+    assert ids(pages) == [row['id'] for row in SWAPS]
+
+def test_boundary_filter():
+    fetch = FakeSubgraph(swaps=SWAPS)
+    list(fs.paginate("Swap", ['id', 'amountUSD'], page_size=7, fetch=fetch))
+    assert fetch.requests[0] == (7, {})
+    # The first page ends on 0x06, the second of two swaps at timestamp 101
+    assert fetch.requests[1] == (7, {'timestamp_gte': '101', 'id_not_in': ['0x05', '0x06']})
+
+def test_cursor_fields_are_not_returned_unless_selected():
+    fetch = FakeSubgraph(swaps=SWAPS)
+    pages = list(fs.paginate("Swap", ['amountUSD'], page_size=10, fetch=fetch))
+    assert [row['amountUSD'] for page in pages for row in page] == [row['amountUSD'] for row in SWAPS]
+    assert set(pages[0][0]) == {'amountUSD'}
+
+def test_id_cursor():
+    fetch = FakeSubgraph(pools=POOLS)
+    pages = list(fs.paginate("Pool", ['id', 'feeTier'], page_size=4, fetch=fetch))
+    assert ids(pages) == [row['id'] for row in POOLS]
+    assert [where for _, where in fetch.requests] == [{}, {'id_gt': '0x03'}, {'id_gt': '0x07'}]
+
+@pytest.mark.parametrize('limit, requested', [
+    (3, [3]),
+    (5, [5]),
+    (12, [5, 5, 2]),
+    (23, [5, 5, 5, 5, 3]),
+    (40, [5, 5, 5, 5, 5]),
+])
+def test_limit(limit, requested):
+    fetch = FakeSubgraph(swaps=SWAPS)
+    pages = list(fs.paginate("Swap", ['id'], limit=limit, page_size=5, fetch=fetch))
+    assert ids(pages) == [row['id'] for row in SWAPS[:limit]]
+    assert [first for first, _ in fetch.requests] == requested
+
+def test_resume_after_cursor():
+    state = {}
+    first = fs.paginate("Swap", ['id'], page_size=7, fetch=FakeSubgraph(swaps=SWAPS), state=state)
+    seen = ids([next(first), next(first)])
+    first.close()
+    assert state['cursor'] == ('102', ['0x0a', '0x0b', '0x0c', '0x0d'])
+    rest = fs.paginate("Swap", ['id'], limit=20 - len(seen), page_size=7,
+                       fetch=FakeSubgraph(swaps=SWAPS), after=tuple(state['cursor']))
+    assert seen + ids(rest) == [row['id'] for row in SWAPS[:20]]
@@ -0,0 +1,29 @@
+import os
+import queue
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import forge_scraper as fs
+
+def messages(jobs):
+    results = queue.Queue()
+    fs.query_worker(jobs, fs.QueryResult('Swap'), results, threading.Event())
+    return [results.get_nowait() for _ in range(results.qsize())]
+
+def failing_pages(error):
+    yield [{'id': '0x01'}]
+    raise error
+
+def test_finished_query_posts_done():
+    assert messages([('swaps', iter([[{'id': '0x01'}]]))])[-1] == ('done',)
+
+def test_unexpected_error_still_ends_the_query():
+    posted = messages([('swaps', failing_pages(ValueError("bad body")))])
+    assert posted[-1][0] == 'error'
+    assert 'bad body' in posted[-1][2]
+
+def test_subgraph_error_is_reported():
+    posted = messages([('swaps', failing_pages(fs.SubgraphError("Query is too complex")))])
+    assert posted[-1] == ('error', "Query Error", "The subgraph returned an error: Query is too complex")
@@ -0,0 +1,41 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import forge_scraper as fs
+
+NOW = 1700000000
+OLD = NOW - 10 * fs.HISTORICAL_AGE
+
+def swaps_query(where, first=3, direction='asc'):
+    return "query {" + fs.build_query("Swap", ['id', 'timestamp'], first, where, 'timestamp', direction) + "}"
+
+def swaps(*timestamps):
+    return {'swaps': [{'id': f'0x{i}', 'timestamp': str(value)} for i, value in enumerate(timestamps)]}
+
+def test_key_depends_on_the_endpoint(tmp_path):
+    cache = fs.ResponseCache(str(tmp_path / 'cache.sqlite'))
+    query = swaps_query({})
+    cache.put(query, swaps(1, 2, 3), 'https://one.example/subgraph')
+    assert cache.get(query, 'https://one.example/subgraph') == swaps(1, 2, 3)
+    assert cache.get(query, 'https://two.example/subgraph') is None
+
+def test_closed_range_in_the_past():
+    assert fs.cache_ttl(swaps_query({'timestamp_lt': str(OLD)}), NOW) == fs.HISTORICAL_TTL
+    assert fs.cache_ttl(swaps_query({'timestamp_lt': str(NOW)}), NOW) == fs.CACHE_TTLS["Swap"]
+
+def test_full_page_of_old_rows_after_a_cursor():
+    query = swaps_query({'timestamp_gte': str(OLD - 100), 'id_not_in': ['0xa']})
+    assert fs.cache_ttl(query, NOW, swaps(OLD - 100, OLD - 50, OLD)) == fs.HISTORICAL_TTL
+    # The last page can still grow, and recent rows can still be reorganised
+    assert fs.cache_ttl(query, NOW, swaps(OLD - 100, OLD)) == fs.CACHE_TTLS["Swap"]
+    assert fs.cache_ttl(query, NOW, swaps(OLD - 100, OLD, NOW - 60)) == fs.CACHE_TTLS["Swap"]
+
+def test_newest_first_pages_are_not_historical():
+    query = swaps_query({}, first=1, direction='desc')
+    assert fs.cache_ttl(query, NOW, swaps(OLD)) == fs.CACHE_TTLS["Swap"]
+
+def test_pages_ordered_by_id_are_not_historical():
+    query = "query {" + fs.build_query("Pool", ['id'], 1, {'id_gt': '0x1'}, 'id', 'asc') + "}"
+    assert fs.cache_ttl(query, NOW, {'pools': [{'id': '0x2'}]}) == fs.CACHE_TTLS["Pool"]
@@ -0,0 +1,50 @@
+import os
+import sys
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import forge_scraper as fs
+
+ROWS = [
+    {'id': 'a', 'amount0': '-1234567.123456789012345678', 'amountUSD': None, 'timestamp': '5'},
+    {'id': 'b', 'amount0': '2', 'amountUSD': '1.5', 'timestamp': '6'},
+]
+
+def test_decimals_are_packed_floats():
+    table = fs.ResultTable()
+    table.extend(ROWS)
+    column = table.numbers('amountUSD')
+    assert isinstance(column, array) and column.typecode == 'd'
+    assert column[0] != column[0] and column[1] == 1.5
+    # Only the value a double cannot print back is kept as text
+    assert table.exact['amount0'] == {0: '-1234567.123456789012345678'}
+
+def test_rows_give_the_exact_text():
+    table = fs.ResultTable()
+    table.extend(ROWS)
+    assert list(table.rows()) == [('a', '-1234567.123456789012345678', None, 5), ('b', '2', '1.5', 6)]
+    assert table.row(1) == ['b', '2', '1.5', 6]
+
+def test_float_input_stays_float():
+    table = fs.ResultTable()
+    table.extend([{'close': 1.25}, {'close': None}])
+    assert list(table.rows()) == [(1.25,), (None,)]
+
+def test_dataframe_shares_the_buffer():
+    table = fs.ResultTable()
+    table.extend(ROWS)
+    frame = table.to_dataframe()
+    assert str(frame['amount0'].dtype) == 'float64'
+    assert frame['amountUSD'].isna().tolist() == [True, False]
+
+def test_candles_come_back_as_a_table():
+    table = fs.ResultTable()
+    table.extend([
+        {'pool': '0xp', 'timestamp': '3600', 'amount0': '1', 'amount1': '-2', 'amountUSD': '5'},
+        {'pool': '0xp', 'timestamp': '3700', 'amount0': '-4', 'amount1': '4', 'amountUSD': '5'},
+    ])
+    candles = fs.candles_result(fs.build_candles(table.to_dataframe(), '1h')).tables['candles']
+    row = dict(zip(candles.columns, candles.row(0)))
+    assert row['open'] == 2.0 and row['close'] == 1.0 and row['trades'] == 2
+    assert candles.numbers('volume0').tolist() == [5.0]
@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import forge_scraper as fs
+from fake_subgraph import FakeSubgraph
+
+WALLETS = ['0xaa', '0xbb']
+SWAPS = [{'id': f'0x{i:02x}', 'timestamp': str(100 + i), 'origin': WALLETS[i % 2], 'pool': '0xp', 'token0': '0x0',
+          'token1': '0x1', 'amount0': '1', 'amount1': '-2', 'amountUSD': '3'} for i in range(10)]
+
+def pull(address):
+    config = {'entity': 'WalletOverview', 'address': address, 'fields': {'Swap': True}}
+    jobs = fs.config_jobs(config, fetch=FakeSubgraph(swaps=SWAPS))
+    return {key: [row for page in pages for row in page] for key, pages in jobs}
+
+@pytest.mark.parametrize('address', ['0xaa', '0xaa, 0xbb'])
+def test_every_row_has_its_wallet(address):
+    rows = pull(address)['swaps']
+    wallets = fs.parse_addresses(address)
+    assert sorted(row['id'] for row in rows) == [row['id'] for row in SWAPS if row['origin'] in wallets]
+    assert all(list(row)[0] == 'wallet' and row['wallet'] == SWAPS[int(row['id'], 16)]['origin'] for row in rows)
+
+def test_one_wallet_has_the_same_columns_as_many():
+    assert list(pull('0xaa')['swaps'][0]) == list(pull('0xaa 0xbb')['swaps'][0])